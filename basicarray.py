@@ -0,0 +1,107 @@
+from array import array
+
+class BASICArray:
+
+    __slots__ = ('name', 'dims', 'strides', 'data')
+
+    def __init__(self, name, dims, reserve=None):
+        # DIM A(N) gives elements 0 to N, as in classic BASIC; elements are
+        # stored row-major in one flat buffer. reserve, if given, is called
+        # with the bytes the elements will take before they are made.
+        self.name = name
+        self.dims = [self.__bound(dim) + 1 for dim in dims]
+        size = self.__shape()
+
+        if reserve is not None:
+            reserve(8 * size)
+
+        if name.endswith('$'):
+            self.data = [""] * size
+        else:
+            # Integer storage keeps whole numbers printing as they were
+            # assigned; the buffer is widened to doubles on the first
+            # value that does not fit
+            self.data = array('q', bytes(8 * size))
+
+    @classmethod
+    def from_state(cls, state):
+        # The array state() gave, checked to be one DIM could have made
+        name, bounds, data = state
+        restored = cls.__new__(cls)
+        restored.name = name
+        restored.dims = [restored.__bound(dim) + 1 for dim in bounds]
+        size = restored.__shape()
+
+        if name.endswith('$'):
+            if type(data) != list or not all(type(item) == str for item in data):
+                raise ValueError('Corrupt string array ' + name)
+        else:
+            typecode, buffer = data
+            if typecode not in ('q', 'd'):
+                raise ValueError('Corrupt numeric array ' + name)
+            data = array(typecode)
+            data.frombytes(buffer)
+        if len(data) != size:
+            raise ValueError('Array ' + name + ' does not match its dimensions')
+        restored.data = data
+        return restored
+
+    def state(self):
+        # The array as plain data: its name, its DIM bounds and its
+        # elements, a numeric array's as its typecode and buffer
+        data = self.data
+        if type(data) != list:
+            data = (data.typecode, data.tobytes())
+        return self.name, [dim - 1 for dim in self.dims], data
+
+    def __shape(self):
+        # Sets the strides for dims and returns the number of elements
+        self.strides = []
+        size = 1
+        for dim in reversed(self.dims):
+            self.strides.insert(0, size)
+            size *= dim
+        return size
+
+    def __bound(self, dim):
+        if type(dim) == str:
+            raise TypeError('Type mismatch in dimensions of array ' + self.name)
+        dim = int(dim)
+        if dim < 0:
+            raise IndexError('Negative dimension for array ' + self.name)
+        return dim
+
+    def __len__(self):
+        return len(self.data)
+
+    def offset(self, indices):
+        if len(indices) != len(self.dims):
+            raise IndexError('Wrong number of subscripts for array ' + self.name)
+
+        offset = 0
+        for index, dim, stride in zip(indices, self.dims, self.strides):
+            if type(index) == str:
+                raise TypeError('Type mismatch in subscript of array ' + self.name)
+            index = int(index)
+            if index < 0 or index >= dim:
+                raise IndexError('Array index out of range for array ' + self.name)
+            offset += index * stride
+        return offset
+
+    def get(self, indices):
+        return self.data[self.offset(indices)]
+
+    def set(self, indices, value):
+        offset = self.offset(indices)
+        if type(self.data) == list and not isinstance(value, str):
+            raise TypeError('Type mismatch assigning to array ' + self.name)
+
+        try:
+            self.data[offset] = value
+
+        except (TypeError, OverflowError):
+            if type(self.data) == list or self.data.typecode == 'd' or \
+               isinstance(value, str):
+                raise TypeError('Type mismatch assigning to array ' + self.name)
+            self.data = array('d', self.data)
+            self.data[offset] = value
@@ -0,0 +1,202 @@
+class Const:
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class Var:
+    __slots__ = ('name', 'slot')
+
+    def __init__(self, name):
+        self.name = name
+        self.slot = None            # set by the Resolver
+
+
+class ArrayRef:
+    __slots__ = ('name', 'indices', 'slot')
+
+    def __init__(self, name, indices):
+        self.name = name
+        self.indices = indices
+        self.slot = None            # array slot, set by the Resolver
+
+
+class Unary:
+    __slots__ = ('op', 'operand')
+
+    def __init__(self, op, operand):
+        self.op = op                # Token.MINUS or Token.NOT
+        self.operand = operand
+
+
+class Binary:
+    __slots__ = ('op', 'left', 'right')
+
+    def __init__(self, op, left, right):
+        self.op = op                # Token category of the operator
+        self.left = left
+        self.right = right
+
+
+class Call:
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, args):
+        self.func = func            # Token category of the built-in
+        self.args = args
+
+
+class Assign:
+    __slots__ = ('name', 'expr', 'slot')
+
+    def __init__(self, name, expr):
+        self.name = name
+        self.expr = expr
+        self.slot = None
+
+
+class ArrayAssign:
+    __slots__ = ('name', 'indices', 'expr', 'slot')
+
+    def __init__(self, name, indices, expr):
+        self.name = name
+        self.indices = indices
+        self.expr = expr
+        self.slot = None
+
+
+class Dim:
+    __slots__ = ('arrays', 'slots')
+
+    def __init__(self, arrays):
+        self.arrays = arrays        # list of (name, [dimension exprs]) pairs
+        self.slots = None
+
+
+class Mat:
+    __slots__ = ('name', 'op', 'operands', 'scalar', 'slot', 'slots')
+
+    def __init__(self, name, op, operands, scalar=None):
+        self.name = name
+        self.op = op                # ZER, CON, IDN, PLUS, MINUS, TIMES or None to copy
+        self.operands = operands    # names of the source arrays
+        self.scalar = scalar
+        self.slot = None
+        self.slots = None
+
+
+class Print:
+    __slots__ = ('items', 'filenum', 'newline')
+
+    def __init__(self, items, filenum=None, newline=True):
+        self.items = items          # list of (expr, is_tab) pairs
+        self.filenum = filenum
+        self.newline = newline
+
+
+class If:
+    __slots__ = ('cond', 'then_target', 'then_body', 'else_target', 'else_body')
+
+    def __init__(self, cond, then_target=None, then_body=None,
+                 else_target=None, else_body=None):
+        self.cond = cond
+        self.then_target = then_target
+        self.then_body = then_body
+        self.else_target = else_target
+        self.else_body = else_body
+
+
+class For:
+    __slots__ = ('var', 'start', 'end', 'step', 'slot')
+
+    def __init__(self, var, start, end, step=None):
+        self.var = var
+        self.start = start
+        self.end = end
+        self.step = step
+        self.slot = None
+
+
+class Next:
+    __slots__ = ('var', 'slot')
+
+    def __init__(self, var):
+        self.var = var
+        self.slot = None
+
+
+class Goto:
+    __slots__ = ('target',)
+
+    def __init__(self, target):
+        self.target = target
+
+
+class Gosub:
+    __slots__ = ('target',)
+
+    def __init__(self, target):
+        self.target = target
+
+
+class OnJump:
+    __slots__ = ('expr', 'targets', 'gosub')
+
+    def __init__(self, expr, targets, gosub):
+        self.expr = expr
+        self.targets = targets
+        self.gosub = gosub
+
+
+class Return:
+    __slots__ = ()
+
+
+class Stop:
+    __slots__ = ()
+
+
+class Data:
+    __slots__ = ()
+
+
+class Read:
+    __slots__ = ('names', 'slots')
+
+    def __init__(self, names):
+        self.names = names
+        self.slots = None
+
+
+class Restore:
+    __slots__ = ('target',)
+
+    def __init__(self, target=None):
+        self.target = target
+
+
+class Open:
+    __slots__ = ('path', 'mode', 'filenum', 'buffer_size')
+
+    def __init__(self, path, mode, filenum, buffer_size=None):
+        self.path = path
+        self.mode = mode
+        self.filenum = filenum
+        self.buffer_size = buffer_size
+
+
+class Close:
+    __slots__ = ('filenums',)
+
+    def __init__(self, filenums):
+        self.filenums = filenums
+
+
+class Input:
+    __slots__ = ('filenum', 'names', 'slots')
+
+    def __init__(self, filenum, names):
+        self.filenum = filenum
+        self.names = names
+        self.slots = None
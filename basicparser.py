@@ -1,73 +1,70 @@
 from basictoken import BASICToken as Token
-from flowsignal import FlowSignal
-import math
-import random
-from time import monotonic
+from basicnode import Const, Var, ArrayRef, Unary, Binary, Call, Assign, \
+    ArrayAssign, Dim, Mat, Print, If, For, Next, Goto, Gosub, OnJump, Return, \
+    Stop, Data, Read, Restore, Open, Close, Input
 
 class BASICParser:
 
-    def __init__(self, basicdata):
-        self.__symbol_table = {}
-        self.__operand_stack = []
-        self.__data = basicdata
-        self.__data_values = []
+    def __init__(self):
         self.__tokenlist = []
         self.__tokenindex = None
-        self.last_flowsignal = None
-        self.__prnt_column = 0
-        self.__file_handles = {}
+        self.__line_number = None
+        self.__end = Token(None, Token.NEWLINE, '')
 
     def parse(self, tokenlist, line_number):
         self.__line_number = line_number
-        self.__tokenlist = []
-        self.__tokenindex = 0
-        linetokenindex = 0
-        for token in tokenlist:
-            if token.category == token.IF:
-                linetokenindex += self.__tokenindex
-                self.__tokenindex = 0
-                self.__tokenlist = tokenlist[linetokenindex:]
-                self.__token = self.__tokenlist[0]
-                flow = self.__stmt()
-                if flow and (flow.ftype == FlowSignal.EXECUTE):
-                    try:
-                        return self.parse(tokenlist[linetokenindex+self.__tokenindex:],line_number)
-                    except RuntimeError as err:
-                        raise RuntimeError(str(err)+' in line ' + str(self.__line_number))
-                else:
-                    return flow
-            elif token.category == token.COLON:
-                linetokenindex += self.__tokenindex
-                self.__tokenindex = 0
-                self.__token = self.__tokenlist[self.__tokenindex]
-
-                flow = self.__stmt()
-                if flow:
-                    return flow
-
-                linetokenindex += 1
-                self.__tokenlist = []
-            elif token.category == token.ELSE:
-                break
-            else:
-                self.__tokenlist.append(token)
+        self.__tokenlist = [token for token in tokenlist
+                            if token.category is not None]
+        self.__tokenindex = -1
+        self.__advance()
+
+        stmts = self.__stmtlist()
+        if self.__token.category != Token.NEWLINE:
+            self.__error('Unexpected ' + self.__token.lexeme)
+
+        return stmts
 
-        linetokenindex += self.__tokenindex
-        self.__tokenindex = 0
-        self.__token = self.__tokenlist[self.__tokenindex]
-        return self.__stmt()
+    def __error(self, message):
+        raise SyntaxError('Syntax error: ' + message +
+                          ' in line ' + str(self.__line_number))
 
     def __advance(self):
         self.__tokenindex += 1
-        if not self.__tokenindex >= len(self.__tokenlist):
+        if self.__tokenindex < len(self.__tokenlist):
             self.__token = self.__tokenlist[self.__tokenindex]
+        else:
+            self.__token = self.__end
 
     def __consume(self, expected_category):
         if self.__token.category == expected_category:
             self.__advance()
+        else:
+            for lexeme, category in list(Token.keywords.items()) + \
+                                    list(Token.smalltokens.items()):
+                if category == expected_category:
+                    break
+            self.__error('Expecting ' + lexeme)
+
+    def __at_stmt_end(self):
+        return self.__token.category in [Token.NEWLINE, Token.COLON, Token.ELSE]
+
+    def __stmtlist(self):
+        stmts = []
+        while not self.__at_stmt_end():
+            if self.__token.category == Token.NEXT:
+                # NEXT I, J is NEXT I followed by NEXT J
+                stmts.extend(self.__nextstmt())
+            else:
+                stmts.append(self.__stmt())
+            if self.__token.category == Token.COLON:
+                self.__advance()
+            elif not self.__at_stmt_end():
+                self.__error('Unexpected ' + self.__token.lexeme)
+
+        return stmts
 
     def __stmt(self):
-        if self.__token.category in [Token.FOR, Token.IF, Token.NEXT, Token.ON]:
+        if self.__token.category in [Token.FOR, Token.IF, Token.ON]:
             return self.__compoundstmt()
 
         else:
@@ -75,221 +72,313 @@ class BASICParser:
 
     def __simplestmt(self):
         if self.__token.category == Token.NAME:
-            self.__assignmentstmt()
-            return None
+            return self.__assignmentstmt()
 
         elif self.__token.category == Token.PRINT:
-            self.__printstmt()
-            return None
+            return self.__printstmt()
 
         elif self.__token.category == Token.LET:
-            self.__letstmt()
-            return None
+            return self.__letstmt()
+
+        elif self.__token.category == Token.GOTO:
+            self.__advance()
+            return Goto(self.__expr())
+
+        elif self.__token.category == Token.GOSUB:
+            self.__advance()
+            return Gosub(self.__expr())
 
         elif self.__token.category == Token.RETURN:
-            return self.__returnstmt()
+            self.__advance()
+            return Return()
 
         elif self.__token.category == Token.STOP:
-            return self.__stopstmt()
+            self.__advance()
+            return Stop()
+
+        elif self.__token.category == Token.READ:
+            return self.__readstmt()
+
+        elif self.__token.category == Token.DIM:
+            return self.__dimstmt()
+
+        elif self.__token.category == Token.MAT:
+            return self.__matstmt()
+
+        elif self.__token.category == Token.RESTORE:
+            self.__advance()
+            if self.__at_stmt_end():
+                return Restore()
+            return Restore(self.__expr())
+
+        elif self.__token.category == Token.OPEN:
+            return self.__openstmt()
+
+        elif self.__token.category == Token.CLOSE:
+            return self.__closestmt()
 
         elif self.__token.category == Token.INPUT:
-            self.__inputstmt()
-            return None
+            return self.__inputstmt()
 
         elif self.__token.category == Token.DATA:
-            self.__datastmt()
-            return None
+            while self.__token.category != Token.NEWLINE:
+                self.__advance()
+            return Data()
+
+        else:
+            self.__error('Unknown statement ' + self.__token.lexeme)
 
     def __printstmt(self):
-        self.__advance()   
+        self.__advance()
 
-        fileIO = False
+        filenum = None
         if self.__token.category == Token.HASH:
-            fileIO = True
-
-            self.__consume(Token.HASH)
-
-            self.__expr()
-            filenum = self.__operand_stack.pop()
+            self.__advance()
+            filenum = self.__expr()
 
-            if self.__tokenindex < len(self.__tokenlist) and self.__token.category != Token.COLON:
+            if not self.__at_stmt_end():
                 self.__consume(Token.COMMA)
 
-        if not self.__tokenindex >= len(self.__tokenlist):
+        items = []
+        newline = True
+        while not self.__at_stmt_end():
             prntTab = (self.__token.category == Token.TAB)
-            self.__logexpr()
-
-            if prntTab:
-                if self.__prnt_column >= len(self.__operand_stack[-1]):
-                    if fileIO:
-                        self.__file_handles[filenum].write("\n")
-                    else:
-                        print()
-                    self.__prnt_column = 0
-
-                current_pr_column = len(self.__operand_stack[-1]) - self.__prnt_column
-                self.__prnt_column = len(self.__operand_stack.pop()) - 1
-                if current_pr_column > 1:
-                    if fileIO:
-                        self.__file_handles[filenum].write(" "*(current_pr_column-1))
-                    else:
-                        print(" "*(current_pr_column-1), end="")
-            else:
-                self.__prnt_column += len(str(self.__operand_stack[-1]))
-                if fileIO:
-                    self.__file_handles[filenum].write('%s' %(self.__operand_stack.pop()))
-                else:
-                    print(self.__operand_stack.pop(), end='')
-
-            while self.__token.category == Token.SEMICOLON:
-                if self.__tokenindex == len(self.__tokenlist) - 1:
-                    self.__advance()
-                    return
+            items.append((self.__logexpr(), prntTab))
+
+            if self.__token.category != Token.SEMICOLON:
+                break
+
+            self.__advance()
+            if self.__at_stmt_end():
+                newline = False
+
+        return Print(items, filenum, newline)
+
+    def __readstmt(self):
+        self.__advance()
+
+        names = []
+        while True:
+            if self.__token.category != Token.NAME:
+                self.__error('Expecting variable name')
+            names.append(self.__token.lexeme)
+            self.__advance()
+
+            if self.__token.category != Token.COMMA:
+                break
+            self.__advance()
+
+        return Read(names)
+
+    def __openstmt(self):
+        self.__advance()
+
+        path = self.__expr()
+        self.__consume(Token.FOR)
+        if self.__token.category not in [Token.INPUT, Token.OUTPUT, Token.APPEND]:
+            self.__error('Expecting INPUT, OUTPUT or APPEND')
+        mode = self.__token.lexeme
+        self.__advance()
+
+        self.__consume(Token.AS)
+        if self.__token.category == Token.HASH:
+            self.__advance()
+        filenum = self.__expr()
+
+        buffer_size = None
+        if self.__token.category == Token.LEN:
+            self.__advance()
+            self.__consume(Token.ASSIGNOP)
+            buffer_size = self.__expr()
+
+        return Open(path, mode, filenum, buffer_size)
+
+    def __closestmt(self):
+        self.__advance()
+
+        filenums = []
+        while not self.__at_stmt_end():
+            if self.__token.category == Token.HASH:
                 self.__advance()
-                prntTab = (self.__token.category == Token.TAB)
-                self.__logexpr()
-
-                if prntTab:
-                    if self.__prnt_column >= len(self.__operand_stack[-1]):
-                        if fileIO:
-                            self.__file_handles[filenum].write("\n")
-                        else:
-                            print()
-                        self.__prnt_column = 0
-                    current_pr_column = len(self.__operand_stack[-1]) - self.__prnt_column
-                    if fileIO:
-                        self.__file_handles[filenum].write(" "*(current_pr_column-1))
-                    else:
-                        print(" "*(current_pr_column-1), end="")
-                    self.__prnt_column = len(self.__operand_stack.pop()) - 1
-                else:
-                    self.__prnt_column += len(str(self.__operand_stack[-1]))
-                    if fileIO:
-                        self.__file_handles[filenum].write('%s' %(self.__operand_stack.pop()))
-                    else:
-                        print(self.__operand_stack.pop(), end='')
-
-        if fileIO:
-            self.__file_handles[filenum].write("\n")
-        else:
-            print()
-        self.__prnt_column = 0
+            filenums.append(self.__expr())
 
-    def __letstmt(self):
-        self.__advance() 
-        self.__assignmentstmt()
+            if self.__token.category != Token.COMMA:
+                break
+            self.__advance()
 
+        return Close(filenums)
 
-    def __returnstmt(self):
-        self.__advance() 
-        return FlowSignal(ftype=FlowSignal.RETURN)
+    def __inputstmt(self):
+        self.__advance()
+
+        self.__consume(Token.HASH)
+        filenum = self.__expr()
+        self.__consume(Token.COMMA)
+
+        names = []
+        while True:
+            if self.__token.category != Token.NAME:
+                self.__error('Expecting variable name')
+            names.append(self.__token.lexeme)
+            self.__advance()
 
-    def __stopstmt(self):
+            if self.__token.category != Token.COMMA:
+                break
+            self.__advance()
+
+        return Input(filenum, names)
+
+    def __dimstmt(self):
         self.__advance()
 
-        for handles in self.__file_handles:
-            self.__file_handles[handles].close()
-        self.__file_handles.clear()
+        arrays = []
+        while True:
+            if self.__token.category != Token.NAME:
+                self.__error('Expecting array name')
+            name = self.__token.lexeme
+            self.__advance()
+            arrays.append((name, self.__subscripts()))
 
-        return FlowSignal(ftype=FlowSignal.STOP)
+            if self.__token.category != Token.COMMA:
+                break
+            self.__advance()
+
+        return Dim(arrays)
+
+    def __matstmt(self):
+        self.__advance()
+
+        target = self.__arrayname()
+        self.__consume(Token.ASSIGNOP)
+
+        if self.__token.category in [Token.ZER, Token.CON, Token.IDN]:
+            op = self.__token.category
+            self.__advance()
+            return Mat(target, op, [])
+
+        if self.__token.category == Token.LEFTPAREN:
+            self.__advance()
+            scalar = self.__logexpr()
+            self.__consume(Token.RIGHTPAREN)
+            self.__consume(Token.TIMES)
+            return Mat(target, Token.TIMES, [self.__arrayname()], scalar)
+
+        operands = [self.__arrayname()]
+        op = None
+        if self.__token.category in [Token.PLUS, Token.MINUS, Token.TIMES]:
+            op = self.__token.category
+            self.__advance()
+            operands.append(self.__arrayname())
+
+        return Mat(target, op, operands)
+
+    def __arrayname(self):
+        if self.__token.category != Token.NAME:
+            self.__error('Expecting array name')
+        name = self.__token.lexeme
+        self.__advance()
+        return name
+
+    def __subscripts(self):
+        self.__consume(Token.LEFTPAREN)
+        indices = [self.__expr()]
+        while self.__token.category == Token.COMMA:
+            self.__advance()
+            indices.append(self.__expr())
+        self.__consume(Token.RIGHTPAREN)
+
+        return indices
+
+    def __letstmt(self):
+        self.__advance()
+        return self.__assignmentstmt()
 
     def __assignmentstmt(self):
-        left = self.__token.lexeme  
-                               
+        if self.__token.category != Token.NAME:
+            self.__error('Expecting variable name')
+
+        left = self.__token.lexeme
         self.__advance()
 
         if self.__token.category == Token.LEFTPAREN:
-            self.__arrayassignmentstmt(left)
+            return self.__arrayassignmentstmt(left)
 
-        else:
-            self.__consume(Token.ASSIGNOP)
-            self.__logexpr()
-            right = self.__operand_stack.pop()
+        self.__consume(Token.ASSIGNOP)
+        return Assign(left, self.__logexpr())
 
-            self.__symbol_table[left] = right
+    def __arrayassignmentstmt(self, name):
+        indices = self.__subscripts()
 
-    def __expr(self):
+        self.__consume(Token.ASSIGNOP)
+        return ArrayAssign(name, indices, self.__logexpr())
 
-        self.__term()   
+    def __expr(self):
+        left = self.__term()
 
         while self.__token.category in [Token.PLUS, Token.MINUS]:
             savedcategory = self.__token.category
             self.__advance()
-            self.__term() 
-                 
-            rightoperand = self.__operand_stack.pop()
-            leftoperand = self.__operand_stack.pop()
+            left = Binary(savedcategory, left, self.__term())
 
-            if savedcategory == Token.PLUS:
-                self.__operand_stack.append(leftoperand + rightoperand)
-
-            else:
-                self.__operand_stack.append(leftoperand - rightoperand)
+        return left
 
     def __term(self):
-        self.__sign = 1  
-                     
-        self.__factor()  
+        left = self.__factor()
 
         while self.__token.category in [Token.TIMES, Token.DIVIDE, Token.MODULO]:
             savedcategory = self.__token.category
             self.__advance()
-            self.__sign = 1  
-            self.__factor()  
-            rightoperand = self.__operand_stack.pop()
-            leftoperand = self.__operand_stack.pop()
-
-            if savedcategory == Token.TIMES:
-                self.__operand_stack.append(leftoperand * rightoperand)
+            left = Binary(savedcategory, left, self.__factor())
 
-            elif savedcategory == Token.DIVIDE:
-                self.__operand_stack.append(leftoperand / rightoperand)
-
-            else:
-                self.__operand_stack.append(leftoperand % rightoperand)
+        return left
 
     def __factor(self):
         if self.__token.category == Token.PLUS:
             self.__advance()
-            self.__factor()
+            return self.__factor()
 
         elif self.__token.category == Token.MINUS:
-            self.__sign = -self.__sign
             self.__advance()
-            self.__factor()
+            return Unary(Token.MINUS, self.__factor())
 
         elif self.__token.category == Token.UNSIGNEDINT:
-            self.__operand_stack.append(self.__sign*int(self.__token.lexeme))
+            value = int(self.__token.lexeme)
             self.__advance()
+            return Const(value)
 
         elif self.__token.category == Token.UNSIGNEDFLOAT:
-            self.__operand_stack.append(self.__sign*float(self.__token.lexeme))
+            value = float(self.__token.lexeme)
             self.__advance()
+            return Const(value)
 
         elif self.__token.category == Token.STRING:
-            self.__operand_stack.append(self.__token.lexeme)
+            value = self.__token.lexeme
             self.__advance()
+            return Const(value)
 
-        elif self.__token.category == Token.LEFTPAREN:
+        elif self.__token.category == Token.NAME:
+            name = self.__token.lexeme
             self.__advance()
-            savesign = self.__sign
-            self.__logexpr()
-
-            if savesign == -1:
-                self.__operand_stack[-1] = -self.__operand_stack[-1]
+            if self.__token.category == Token.LEFTPAREN:
+                return ArrayRef(name, self.__subscripts())
+            return Var(name)
 
+        elif self.__token.category == Token.LEFTPAREN:
+            self.__advance()
+            expr = self.__logexpr()
             self.__consume(Token.RIGHTPAREN)
+            return expr
 
         elif self.__token.category in Token.functions:
-            self.__operand_stack.append(self.__evaluate_function(self.__token.category))
+            return self.__function()
+
+        else:
+            self.__error('Unexpected ' + (self.__token.lexeme or 'end of line'))
 
     def __compoundstmt(self):
         if self.__token.category == Token.FOR:
             return self.__forstmt()
 
-        elif self.__token.category == Token.NEXT:
-            return self.__nextstmt()
-
         elif self.__token.category == Token.IF:
             return self.__ifstmt()
 
@@ -297,211 +386,136 @@ class BASICParser:
             return self.__ongosubstmt()
 
     def __ifstmt(self):
-        self.__advance()  
-        self.__logexpr()
-
- 
-        saveval = self.__operand_stack.pop()
+        self.__advance()
+        stmt = If(self.__logexpr())
 
         self.__consume(Token.THEN)
 
-        if self.__token.category != Token.UNSIGNEDINT:
-            if saveval:
-                return FlowSignal(ftype=FlowSignal.EXECUTE)
+        if self.__token.category == Token.UNSIGNEDINT:
+            stmt.then_target = self.__expr()
         else:
-            self.__expr()
-
-            if saveval:
-                return FlowSignal(ftarget=self.__operand_stack.pop())
-
- 
-        while self.__tokenindex < len(self.__tokenlist) and self.__token.category != Token.ELSE:
-            self.__advance()
+            stmt.then_body = self.__stmtlist()
 
         if self.__token.category == Token.ELSE:
             self.__advance()
 
-            if self.__token.category != Token.UNSIGNEDINT:
-                return FlowSignal(ftype=FlowSignal.EXECUTE)
+            if self.__token.category == Token.UNSIGNEDINT:
+                stmt.else_target = self.__expr()
             else:
+                stmt.else_body = self.__stmtlist()
 
-                self.__expr()
-
-                return FlowSignal(ftarget=self.__operand_stack.pop())
+        # A loop body cannot start inside an IF branch, so a FOR there
+        # must end the branch and its body starts on the next line
+        for body in [stmt.then_body, stmt.else_body]:
+            if body and any(type(branch_stmt) == For for branch_stmt in body[:-1]):
+                self.__error('FOR must be the last statement of an IF branch')
 
-        else:
-            return None
+        return stmt
 
     def __forstmt(self):
-        step = 1
+        self.__advance()
 
-        self.__advance()  
+        if self.__token.category != Token.NAME:
+            self.__error('Expecting loop variable')
+        loop_variable = self.__token.lexeme
 
-        loop_variable = self.__token.lexeme  
+        if loop_variable.endswith('$'):
+            self.__error('Loop variable is not numeric')
 
-        self.__advance()  
+        self.__advance()
         self.__consume(Token.ASSIGNOP)
-        self.__expr()
-
-        start_val = self.__operand_stack.pop()
+        start_val = self.__expr()
 
         self.__consume(Token.TO)
+        end_val = self.__expr()
 
-        self.__expr()
-        end_val = self.__operand_stack.pop()
-
-        increment = True
-        if not self.__tokenindex >= len(self.__tokenlist):
-            self.__consume(Token.STEP)
+        step = None
+        if self.__token.category == Token.STEP:
+            self.__advance()
+            step = self.__expr()
 
-            self.__expr()
-            step = self.__operand_stack.pop()
+        return For(loop_variable, start_val, end_val, step)
 
-            if step == 0:
-                raise IndexError('Zero step value supplied for loop' +
-                                 ' in line ' + str(self.__line_number))
+    def __nextstmt(self):
+        self.__advance()
 
-            elif step < 0:
-                increment = False
+        stmts = []
+        while True:
+            if self.__token.category != Token.NAME:
+                self.__error('Expecting loop variable')
+            loop_variable = self.__token.lexeme
 
-        from_next = False
-        if self.last_flowsignal:
-            if self.last_flowsignal.ftype == FlowSignal.LOOP_REPEAT:
-                from_next = True
+            if loop_variable.endswith('$'):
+                self.__error('Loop variable is not numeric')
 
-        if not from_next:
-            self.__symbol_table[loop_variable] = start_val
+            self.__advance()
+            stmts.append(Next(loop_variable))
 
-        else:
-            self.__symbol_table[loop_variable] += step
-        stop = False
-        if increment and self.__symbol_table[loop_variable] > end_val:
-            stop = True
+            if self.__token.category != Token.COMMA:
+                break
+            self.__advance()
 
-        elif not increment and self.__symbol_table[loop_variable] < end_val:
-            stop = True
+        return stmts
 
-        if stop:
-            return FlowSignal(ftype=FlowSignal.LOOP_SKIP,
-                              ftarget=loop_variable)
-        else:
-            return FlowSignal(ftype=FlowSignal.LOOP_BEGIN,floop_var=loop_variable)
+    def __ongosubstmt(self):
+        self.__advance()
+        expr = self.__expr()
 
-    def __nextstmt(self):
-        self.__advance()  
-        loop_variable = self.__token.lexeme  
+        if self.__token.category not in [Token.GOTO, Token.GOSUB]:
+            self.__error('Expecting GOTO or GOSUB')
+        gosub = (self.__token.category == Token.GOSUB)
+        self.__advance()
 
-        if loop_variable.endswith('$'):
-            raise SyntaxError('Syntax error: Loop variable is not numeric' +
-                              ' in line ' + str(self.__line_number))
+        targets = [self.__expr()]
+        while self.__token.category == Token.COMMA:
+            self.__advance()
+            targets.append(self.__expr())
 
-        return FlowSignal(ftype=FlowSignal.LOOP_REPEAT,floop_var=loop_variable)
+        return OnJump(expr, targets, gosub)
 
     def __relexpr(self):
-        self.__expr()
-        if self.__token.category == Token.ASSIGNOP:
-            self.__token.category = Token.EQUAL
+        left = self.__expr()
 
-        if self.__token.category in [Token.LESSER, Token.GREATER, Token.EQUAL, Token.NOTEQUAL]:
+        if self.__token.category in [Token.ASSIGNOP, Token.LESSER, Token.GREATER,
+                                     Token.EQUAL, Token.NOTEQUAL]:
             savecat = self.__token.category
+            if savecat == Token.ASSIGNOP:
+                savecat = Token.EQUAL
             self.__advance()
-            self.__expr()
+            left = Binary(savecat, left, self.__expr())
 
-            right = self.__operand_stack.pop()
-            left = self.__operand_stack.pop()
-
-            if savecat == Token.EQUAL:
-                self.__operand_stack.append(left == right)  
-
-            elif savecat == Token.NOTEQUAL:
-                self.__operand_stack.append(left != right)  
-
-            elif savecat == Token.LESSER:
-                self.__operand_stack.append(left < right) 
-
-            elif savecat == Token.GREATER:
-                self.__operand_stack.append(left > right)  
+        return left
 
     def __logexpr(self):
-        self.__notexpr()
+        left = self.__notexpr()
 
         while self.__token.category in [Token.OR, Token.AND]:
             savecat = self.__token.category
             self.__advance()
-            self.__notexpr()
-
-            right = self.__operand_stack.pop()
-            left = self.__operand_stack.pop()
+            left = Binary(savecat, left, self.__notexpr())
 
-            if savecat == Token.OR:
-                self.__operand_stack.append(left or right)  # Push True or False
-
-            elif savecat == Token.AND:
-                self.__operand_stack.append(left and right)  # Push True or False
+        return left
 
     def __notexpr(self):
         if self.__token.category == Token.NOT:
             self.__advance()
-            self.__relexpr()
-            right = self.__operand_stack.pop()
-            self.__operand_stack.append(not right)
+            return Unary(Token.NOT, self.__relexpr())
         else:
-            self.__relexpr()
-
-    def __evaluate_function(self, category):
-        self.__advance()  
-
-        if category == Token.LEFT:
-            self.__consume(Token.LEFTPAREN)
-
-            self.__expr()
-            instring = self.__operand_stack.pop()
-
-            self.__consume(Token.COMMA)
-
-            self.__expr()
-            chars = self.__operand_stack.pop()
-
-            self.__consume(Token.RIGHTPAREN)
-
-            return instring[:chars]
-
-        if category == Token.RIGHT:
-            self.__consume(Token.LEFTPAREN)
-            self.__expr()
-            instring = self.__operand_stack.pop()
-            self.__consume(Token.COMMA)
-            self.__expr()
-            chars = self.__operand_stack.pop()
-            self.__consume(Token.RIGHTPAREN)
-
-            return instring[-chars:]
+            return self.__relexpr()
 
-        
+    def __function(self):
+        category = self.__token.category
+        self.__advance()
 
         self.__consume(Token.LEFTPAREN)
-
-        self.__expr()
-        value = self.__operand_stack.pop()
-
+        args = [self.__expr()]
+        while self.__token.category == Token.COMMA:
+            self.__advance()
+            args.append(self.__expr())
         self.__consume(Token.RIGHTPAREN)
 
-        if category == Token.INT:
-
-            return math.floor(value)
-
-        elif category == Token.STR:
-            return str(value)
-
-        elif category == Token.VAL:
-            numeric = float(value)
-            if numeric.is_integer():
-                return int(numeric)
-            return numeric
-
-        elif category == Token.LEN:
-            len(value)
+        arity = 2 if category in [Token.LEFT, Token.RIGHT] else 1
+        if len(args) != arity:
+            self.__error('Wrong number of arguments')
 
-        elif category == Token.TAB:
-            if isinstance(value, int):
-                return " "*value
\ No newline at end of file
+        return Call(category, args)
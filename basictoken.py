@@ -46,6 +46,22 @@ class BASICToken:
         SEMICOLON       = 47  # SEMICOLON
         LEFT            = 48  # LEFT$ function
         RIGHT           = 49  # RIGHT$ function
+        GOTO            = 50  # GOTO keyword
+        GOSUB           = 51  # GOSUB keyword
+        READ            = 52  # READ keyword
+        RESTORE         = 53  # RESTORE keyword
+        DIM             = 54  # DIM keyword
+        MAT             = 55  # MAT keyword
+        ZER             = 56  # ZER matrix
+        CON             = 57  # CON matrix
+        IDN             = 58  # IDN matrix
+        OPEN            = 59  # OPEN keyword
+        CLOSE           = 60  # CLOSE keyword
+        INPUT           = 61  # INPUT keyword
+        OUTPUT          = 62  # OUTPUT file mode
+        APPEND          = 63  # APPEND file mode
+        AS              = 64  # AS keyword
+        EOF             = 65  # EOF function
 
         catnames = ['LET', 'PRINT', 'RUN',
         'FOR', 'NEXT', 'IF', 'THEN', 'ELSE', 'ASSIGNOP',
@@ -55,7 +71,8 @@ class BASICToken:
         'NOTEQUAL', 'TO', 'UNSIGNEDFLOAT', 'STRING', 'NEW', 'EQUAL',
         'COMMA', 'STOP', 'COLON','ON','DATA', 'INT','MODULO',
         'VAL', 'LEN','AND', 'OR', 'NOT', 'HASH', 'TAB', 'SEMICOLON',
-        'LEFT', 'RIGHT']
+        'LEFT', 'RIGHT', 'GOTO', 'GOSUB', 'READ', 'RESTORE', 'DIM', 'MAT', 'ZER', 'CON', 'IDN',
+        'OPEN', 'CLOSE', 'INPUT', 'OUTPUT', 'APPEND', 'AS', 'EOF']
 
         smalltokens = {'=': ASSIGNOP, '(': LEFTPAREN, ')': RIGHTPAREN,
                        '+': PLUS, '-': MINUS, '*': TIMES, '/': DIVIDE,
@@ -74,12 +91,27 @@ class BASICToken:
                     'DATA': DATA, 'INT': INT,'STR$': STR,'MOD': MODULO,
                     'VAL': VAL, 'LEN': LEN,
                     'END': STOP,'AND': AND, 'OR': OR, 'NOT': NOT,
-                    'TAB': TAB,'LEFT$': LEFT, 'RIGHT$': RIGHT}
+                    'TAB': TAB,'LEFT$': LEFT, 'RIGHT$': RIGHT,
+                    'GOTO': GOTO, 'GOSUB': GOSUB,
+                    'READ': READ, 'RESTORE': RESTORE, 'DIM': DIM,
+                    'MAT': MAT, 'ZER': ZER, 'CON': CON, 'IDN': IDN,
+                    'OPEN': OPEN, 'CLOSE': CLOSE, 'INPUT': INPUT,
+                    'OUTPUT': OUTPUT, 'APPEND': APPEND, 'AS': AS, 'EOF': EOF}
 
-        functions = {INT,STR, VAL, LEN, TAB, LEFT, RIGHT}
+        functions = {INT,STR, VAL, LEN, TAB, LEFT, RIGHT, EOF}
+
+        __slots__ = ('column', 'category', 'lexeme')
 
         def __init__(self, column, category, lexeme):
 
             self.column = column      
             self.category = category  
-            self.lexeme = lexeme      
\ No newline at end of file
+            self.lexeme = lexeme      
+
+        @property
+        def span(self):
+            # Columns covered by the token in its line, quotes included
+            width = len(self.lexeme)
+            if self.category == BASICToken.STRING:
+                width += 2
+            return self.column, self.column + width
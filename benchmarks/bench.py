@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(here))
+
+from lexer import Lexer
+from output import BASICOutput
+from program import Program
+import interpreter
+
+# Each workload is a program in programs/ and the number of units of work
+# ("ops") one run of it performs, which ops/sec is reported against:
+#   loops    inner iterations of two nested FOR/NEXT loops
+#   gosub    GOSUB calls of a recursive factorial kept on a DIM stack
+#   strings  strings built with STR$, LEFT$ and RIGHT$
+#   data     values READ, with a RESTORE every pass over the DATA
+#   print    PRINT statements with TAB columns, to a discarded stream
+#   load     source lines through Lexer.tokenize and Program.add_stmt
+workloads = {'loops': 200 * 200, 'gosub': 200 * 20, 'strings': 5000,
+             'data': 50 * 200, 'print': 5000}
+load_lines = 5000
+
+
+class NullStream:
+
+    def write(self, data):
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def load_source():
+    lines = []
+    for index in range(load_lines):
+        line_number = 10 * (index + 1)
+        if index % 4 == 0:
+            lines.append('%d LET A%d = (%d + B) * 2 - C / 3' % (line_number, index % 26, index))
+        elif index % 4 == 1:
+            lines.append('%d IF A > %d THEN PRINT "HIGH"; A ELSE PRINT "LOW"' % (line_number, index))
+        elif index % 4 == 2:
+            lines.append('%d DATA %d, "ITEM %d", %d.5' % (line_number, index, index, index))
+        else:
+            lines.append('%d PRINT LEFT$("ABCDEF", 3); STR$(%d); TAB(20); X' % (line_number, index))
+    return lines
+
+
+def runner(name, engine):
+    # Returns a function doing one run of the workload
+    if name == 'load':
+        lines = load_source()
+
+        def load():
+            lexer = Lexer()
+            program = Program()
+            for line in lines:
+                program.add_stmt(lexer.tokenize(line))
+
+        return load
+
+    with open(os.path.join(here, 'programs', name + '.bas')) as source_file:
+        program = interpreter.load(Program(), source_file.read())
+    output = BASICOutput(NullStream())
+
+    def run():
+        program.execute(engine=engine, output=output)
+
+    return run
+
+
+def measure(run, repeat, min_time):
+    # Best time per run out of repeat rounds, each of which runs the
+    # workload enough times to take at least min_time
+    best = None
+    for _ in range(repeat):
+        runs = 0
+        start = time.perf_counter()
+        while True:
+            run()
+            runs += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        per_run = elapsed / runs
+        if best is None or per_run < best:
+            best = per_run
+    return best
+
+
+def peak_memory(run):
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(names, engines, repeat, min_time):
+    results = {}
+    for name in names:
+        for engine in (['tree'] if name == 'load' else engines):
+            run = runner(name, engine)
+            run()
+            per_run = measure(run, repeat, min_time)
+            ops = load_lines if name == 'load' else workloads[name]
+            key = name if name == 'load' else name + ':' + engine
+            results[key] = {'seconds': per_run, 'ops_per_sec': ops / per_run,
+                            'peak_kib': peak_memory(run) / 1024.0}
+    return results
+
+
+def report(results, baseline, threshold):
+    # Prints one row per workload; returns the keys that are slower than
+    # the baseline by more than threshold
+    regressions = []
+    print('%-14s %14s %12s %10s %10s' % ('workload', 'ops/sec', 'peak KiB',
+                                         'speed', 'memory'))
+    for key in sorted(results):
+        result = results[key]
+        speed = memory = ''
+        if key in baseline:
+            speed_ratio = result['ops_per_sec'] / baseline[key]['ops_per_sec']
+            memory_ratio = result['peak_kib'] / max(baseline[key]['peak_kib'], 1e-9)
+            speed = '%.2fx' % speed_ratio
+            memory = '%.2fx' % memory_ratio
+            if speed_ratio < 1.0 - threshold:
+                regressions.append(key)
+                speed += ' !'
+        print('%-14s %14.0f %12.1f %10s %10s' % (key, result['ops_per_sec'],
+                                                  result['peak_kib'], speed, memory))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the BASIC interpreter.')
+    parser.add_argument('workloads', nargs='*',
+                        help='workloads to run, from ' +
+                             ', '.join(sorted(workloads) + ['load']) + ' (default: all)')
+    parser.add_argument('--engine', choices=['tree', 'vm', 'both'], default='both')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='rounds per workload; the best is kept (default: 3)')
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='minimum seconds per round (default: 0.2)')
+    parser.add_argument('--baseline', default=os.path.join(here, 'baseline.json'),
+                        help='baseline JSON to compare with or save to')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='write these results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='slowdown against the baseline reported as a'
+                             ' regression (default: 0.10)')
+    args = parser.parse_args(argv)
+
+    names = args.workloads or sorted(workloads) + ['load']
+    for name in names:
+        if name not in workloads and name != 'load':
+            parser.error('unknown workload ' + name)
+    engines = ['tree', 'vm'] if args.engine == 'both' else [args.engine]
+    results = benchmark(names, engines, args.repeat, args.min_time)
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    regressions = report(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=1, sort_keys=True)
+        print('Baseline saved to ' + args.baseline)
+    elif regressions:
+        print('Slower than baseline: ' + ', '.join(regressions))
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,29 @@
+10 S = 0
+20 FOR R = 1 TO 50
+30 RESTORE
+40 FOR I = 1 TO 200
+50 READ A, B$
+60 S = S + A + LEN(B$)
+70 NEXT I
+80 NEXT R
+90 PRINT S
+1000 DATA 0, "W0", 1, "W1", 2, "W2", 3, "W3", 4, "W4", 5, "W5", 6, "W6", 7, "W7", 8, "W8", 9, "W9"
+1010 DATA 10, "W0", 11, "W1", 12, "W2", 13, "W3", 14, "W4", 15, "W5", 16, "W6", 17, "W7", 18, "W8", 19, "W9"
+1020 DATA 20, "W0", 21, "W1", 22, "W2", 23, "W3", 24, "W4", 25, "W5", 26, "W6", 27, "W7", 28, "W8", 29, "W9"
+1030 DATA 30, "W0", 31, "W1", 32, "W2", 33, "W3", 34, "W4", 35, "W5", 36, "W6", 37, "W7", 38, "W8", 39, "W9"
+1040 DATA 40, "W0", 41, "W1", 42, "W2", 43, "W3", 44, "W4", 45, "W5", 46, "W6", 47, "W7", 48, "W8", 49, "W9"
+1050 DATA 50, "W0", 51, "W1", 52, "W2", 53, "W3", 54, "W4", 55, "W5", 56, "W6", 57, "W7", 58, "W8", 59, "W9"
+1060 DATA 60, "W0", 61, "W1", 62, "W2", 63, "W3", 64, "W4", 65, "W5", 66, "W6", 67, "W7", 68, "W8", 69, "W9"
+1070 DATA 70, "W0", 71, "W1", 72, "W2", 73, "W3", 74, "W4", 75, "W5", 76, "W6", 77, "W7", 78, "W8", 79, "W9"
+1080 DATA 80, "W0", 81, "W1", 82, "W2", 83, "W3", 84, "W4", 85, "W5", 86, "W6", 87, "W7", 88, "W8", 89, "W9"
+1090 DATA 90, "W0", 91, "W1", 92, "W2", 93, "W3", 94, "W4", 95, "W5", 96, "W6", 97, "W7", 98, "W8", 99, "W9"
+1100 DATA 100, "W0", 101, "W1", 102, "W2", 103, "W3", 104, "W4", 105, "W5", 106, "W6", 107, "W7", 108, "W8", 109, "W9"
+1110 DATA 110, "W0", 111, "W1", 112, "W2", 113, "W3", 114, "W4", 115, "W5", 116, "W6", 117, "W7", 118, "W8", 119, "W9"
+1120 DATA 120, "W0", 121, "W1", 122, "W2", 123, "W3", 124, "W4", 125, "W5", 126, "W6", 127, "W7", 128, "W8", 129, "W9"
+1130 DATA 130, "W0", 131, "W1", 132, "W2", 133, "W3", 134, "W4", 135, "W5", 136, "W6", 137, "W7", 138, "W8", 139, "W9"
+1140 DATA 140, "W0", 141, "W1", 142, "W2", 143, "W3", 144, "W4", 145, "W5", 146, "W6", 147, "W7", 148, "W8", 149, "W9"
+1150 DATA 150, "W0", 151, "W1", 152, "W2", 153, "W3", 154, "W4", 155, "W5", 156, "W6", 157, "W7", 158, "W8", 159, "W9"
+1160 DATA 160, "W0", 161, "W1", 162, "W2", 163, "W3", 164, "W4", 165, "W5", 166, "W6", 167, "W7", 168, "W8", 169, "W9"
+1170 DATA 170, "W0", 171, "W1", 172, "W2", 173, "W3", 174, "W4", 175, "W5", 176, "W6", 177, "W7", 178, "W8", 179, "W9"
+1180 DATA 180, "W0", 181, "W1", 182, "W2", 183, "W3", 184, "W4", 185, "W5", 186, "W6", 187, "W7", 188, "W8", 189, "W9"
+1190 DATA 190, "W0", 191, "W1", 192, "W2", 193, "W3", 194, "W4", 195, "W5", 196, "W6", 197, "W7", 198, "W8", 199, "W9"
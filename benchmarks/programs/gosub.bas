@@ -0,0 +1,21 @@
+10 DIM K(64)
+20 T = 0
+30 FOR R = 1 TO 200
+40 N = 20
+50 P = 0
+60 GOSUB 200
+70 T = T + F
+80 NEXT R
+90 PRINT T
+100 STOP
+200 IF N < 2 THEN GOTO 260
+210 P = P + 1
+220 K(P) = N
+230 N = N - 1
+240 GOSUB 200
+250 GOTO 280
+260 F = 1
+270 RETURN
+280 F = F * K(P)
+290 P = P - 1
+300 RETURN
@@ -0,0 +1,7 @@
+10 S = 0
+20 FOR I = 1 TO 200
+30 FOR J = 1 TO 200
+40 S = S + I * J - J
+50 NEXT J
+60 NEXT I
+70 PRINT S
@@ -0,0 +1,3 @@
+10 FOR I = 1 TO 5000
+20 PRINT "ROW"; I; TAB(12); I * 3; TAB(24); "END"
+30 NEXT I
@@ -0,0 +1,7 @@
+10 T = 0
+20 FOR I = 1 TO 5000
+30 A$ = STR$(I)
+40 B$ = LEFT$(A$ + "ABCDEFGH", 6) + RIGHT$("XYZ" + A$, 3)
+50 T = T + LEN(B$)
+60 NEXT I
+70 PRINT T
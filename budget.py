@@ -0,0 +1,132 @@
+import sys
+import time
+
+class BudgetExceeded(RuntimeError):
+
+    # Raised when a run uses up one of its budgets; budget is the name of
+    # the limit, as given to Budget, and line_number the line running then
+
+    def __init__(self, budget, limit, line_number, message):
+        RuntimeError.__init__(self, message + ' in line ' + str(line_number))
+        self.budget = budget
+        self.limit = limit
+        self.line_number = line_number
+
+
+class Budget:
+
+    # Limits on one run of a program:
+    #   lines        lines run, a line counting once however many
+    #                statements it has
+    #   seconds      wall time since the run started
+    #   gosub_depth  GOSUBs waiting for their RETURN
+    #   memory       bytes held by variables and arrays, estimated
+    # None leaves a limit off. Limits are checked every check_every lines,
+    # so the time and depth limits can be overrun by what that many lines
+    # do; the line limit is exact. Memory is checked before every line, and
+    # DIM checks the array it is about to make, so that a program cannot
+    # take much more than its limit.
+
+    def __init__(self, lines=None, seconds=None, gosub_depth=None, memory=None,
+                 check_every=1000, timer=time.perf_counter):
+        if check_every < 1:
+            raise ValueError('Budget check interval must be at least 1')
+        self.lines = lines
+        self.seconds = seconds
+        self.gosub_depth = gosub_depth
+        self.memory = memory
+        self.check_every = check_every
+        self.timer = timer
+
+    def meter(self, evaluator, return_stack):
+        # Returns a callback to call with each line number before the
+        # line runs, for a run with this evaluator and GOSUB stack
+        return Meter(self, evaluator, return_stack)
+
+
+class Meter:
+
+    __slots__ = ('budget', 'evaluator', 'return_stack', 'used', 'countdown',
+                 'deadline')
+
+    def __init__(self, budget, evaluator, return_stack):
+        self.budget = budget
+        self.evaluator = evaluator
+        self.return_stack = return_stack
+        self.used = 0
+        self.deadline = None
+        if budget.seconds is not None:
+            self.deadline = budget.timer() + budget.seconds
+        self.countdown = self.__interval()
+        if budget.memory is not None:
+            evaluator.memory_check = self.reserve
+
+    def __interval(self):
+        interval = self.budget.check_every
+        if self.budget.lines is not None:
+            interval = min(interval, self.budget.lines - self.used + 1)
+        return interval
+
+    def __call__(self, line_number):
+        if self.budget.memory is not None:
+            self.reserve(0, line_number)
+        self.countdown -= 1
+        if self.countdown > 0:
+            return
+
+        self.used += self.__interval()
+        self.countdown = self.__interval()
+        self.check(line_number)
+
+    def wrap(self, execute_line):
+        def metered(line_number):
+            self(line_number)
+            return execute_line(line_number)
+
+        return metered
+
+    def check(self, line_number):
+        budget = self.budget
+        if budget.lines is not None and self.used > budget.lines:
+            raise BudgetExceeded('lines', budget.lines, line_number,
+                                 'Line budget of ' + str(budget.lines) +
+                                 ' exceeded')
+
+        if self.deadline is not None and budget.timer() > self.deadline:
+            raise BudgetExceeded('seconds', budget.seconds, line_number,
+                                 'Time budget of ' + str(budget.seconds) +
+                                 ' seconds exceeded')
+
+        if budget.gosub_depth is not None and \
+           len(self.return_stack) > budget.gosub_depth:
+            raise BudgetExceeded('gosub_depth', budget.gosub_depth, line_number,
+                                 'GOSUB depth budget of ' +
+                                 str(budget.gosub_depth) + ' exceeded')
+
+        if budget.memory is not None:
+            self.reserve(0, line_number)
+
+    def reserve(self, size, line_number):
+        # Checks the memory limit allows size bytes more than the run holds
+        # now, before they are taken
+        memory = self.budget.memory
+        if variable_memory(self.evaluator) + size > memory:
+            raise BudgetExceeded('memory', memory, line_number,
+                                 'Memory budget of ' + str(memory) +
+                                 ' bytes exceeded')
+
+
+def variable_memory(evaluator):
+    # Bytes held by the scalar variables and arrays of a run
+    size = sys.getsizeof(evaluator.symbol_table)
+    for value in evaluator.symbol_table:
+        if value is not None:
+            size += sys.getsizeof(value)
+
+    for array in evaluator.arrays:
+        if array is not None:
+            size += sys.getsizeof(array.data)
+            if type(array.data) == list:
+                # Each string's characters, beyond the pointer to it
+                size += sum(map(len, array.data))
+    return size
@@ -0,0 +1,63 @@
+from collections import OrderedDict
+
+class CallCache:
+
+    # Results of built-in function calls, by function and argument values
+    # and types (STR$(1) and STR$(1.0) differ), keeping the size most
+    # recently used. A size of 0 turns caching off. Calls that raise are
+    # not cached.
+
+    def __init__(self, size=256):
+        if size < 0:
+            raise ValueError('Call cache size cannot be negative')
+        self.size = size
+        self.__entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def wrap(self, func, function):
+        # Returns function with its results kept in this cache under the
+        # function token func
+        entries = self.__entries
+        missing = object()
+
+        def cached(*args):
+            key = (func, args, tuple(map(type, args)))
+            value = entries.get(key, missing)
+            if value is not missing:
+                entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+            self.misses += 1
+            value = function(*args)
+            entries[key] = value
+            if len(entries) > self.size:
+                entries.popitem(last=False)
+                self.evictions += 1
+            return value
+
+        return cached
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'entries': len(self.__entries),
+                'size': self.size}
+
+    def clear(self):
+        self.__entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+
+# Padding of fewer than 256 spaces is built once and shared
+_spaces = [" " * count for count in range(256)]
+
+
+def spaces(count):
+    if 0 <= count < len(_spaces):
+        return _spaces[count]
+    return " " * count
@@ -0,0 +1,161 @@
+import csv
+import mmap
+import os
+
+class BASICChannels:
+
+    # The files a program has OPENed, by channel number. Input files of
+    # map_threshold bytes or more are memory-mapped rather than read
+    # through a buffer; a map_threshold of None never maps them.
+
+    INPUT, OUTPUT, APPEND = 'INPUT', 'OUTPUT', 'APPEND'
+
+    def __init__(self, buffer_size=65536, map_threshold=64 * 1024 * 1024):
+        self.buffer_size = buffer_size
+        self.map_threshold = map_threshold
+        self.__channels = {}
+        self.__opened = {}
+
+    def __contains__(self, number):
+        return number in self.__channels
+
+    def open(self, number, path, mode, buffer_size=None):
+        if number in self.__channels:
+            raise RuntimeError('File #' + str(number) + ' is already open')
+        if buffer_size is None:
+            buffer_size = self.buffer_size
+
+        # The path is resolved first, so that nothing can fail between
+        # opening the file and recording it to be closed
+        opened = (os.path.abspath(path), mode, buffer_size)
+        self.__channels[number] = self.__channel(path, mode, buffer_size)
+        self.__opened[number] = opened
+
+    def __channel(self, path, mode, buffer_size):
+        if mode == self.INPUT:
+            size = os.path.getsize(path)
+            if self.map_threshold is not None and size > 0 and \
+               size >= self.map_threshold:
+                return MappedInputChannel(path)
+            return InputChannel(path, buffer_size)
+        return OutputChannel(path, mode == self.APPEND, buffer_size)
+
+    def close(self, number=None):
+        if number is None:
+            for channel in self.__channels.values():
+                channel.close()
+            self.__channels.clear()
+            self.__opened.clear()
+        elif number in self.__channels:
+            self.__channels.pop(number).close()
+            del self.__opened[number]
+
+    def state(self):
+        # The open files, each as its channel number, absolute path, mode,
+        # buffer size and position
+        return [(number, path, mode, buffer_size, self.__channels[number].tell())
+                for number, (path, mode, buffer_size) in self.__opened.items()]
+
+    def restore(self, state):
+        # Reopens files as they were when state was taken. Output files
+        # are cut back to that point, dropping what was written since.
+        self.close()
+        for number, path, mode, buffer_size, position in state:
+            if mode == self.INPUT:
+                channel = self.__channel(path, mode, buffer_size)
+                channel.seek(position)
+            else:
+                os.truncate(path, position)
+                channel = OutputChannel(path, True, buffer_size)
+            self.__channels[number] = channel
+            self.__opened[number] = (path, mode, buffer_size)
+
+    def input(self, number):
+        channel = self.__get(number)
+        if not isinstance(channel, InputChannel):
+            raise RuntimeError('File #' + str(number) + ' is not open for INPUT')
+        return channel
+
+    def output(self, number):
+        channel = self.__get(number)
+        if not isinstance(channel, OutputChannel):
+            raise RuntimeError('File #' + str(number) + ' is not open for OUTPUT')
+        return channel
+
+    def __get(self, number):
+        if number not in self.__channels:
+            raise RuntimeError('File #' + str(number) + ' is not open')
+        return self.__channels[number]
+
+
+class OutputChannel:
+
+    def __init__(self, path, append, buffer_size):
+        self.__file = open(path, 'a' if append else 'w',
+                           buffering=buffer_size or -1, encoding='utf-8')
+        self.write = self.__file.write
+
+    def tell(self):
+        self.__file.flush()
+        return self.__file.tell()
+
+    def close(self):
+        self.__file.close()
+
+
+class InputChannel:
+
+    # Lines are split into comma separated fields, with double quotes
+    # around fields that contain commas. One line is always read ahead,
+    # so that EOF can be answered before an INPUT would fail.
+
+    def __init__(self, path, buffer_size=None):
+        self._open(path, buffer_size)
+        self.__fields = []
+        self.__lookahead = self._readline()
+
+    def _open(self, path, buffer_size):
+        self._file = open(path, 'r', buffering=buffer_size or -1,
+                          encoding='utf-8', newline='')
+
+    def _readline(self):
+        return self._file.readline()
+
+    def tell(self):
+        # The offset of the line read ahead, and the fields still to be
+        # read from the line before it
+        return (self._file.tell() - len(self.__lookahead.encode('utf-8')),
+                list(self.__fields))
+
+    def seek(self, position):
+        offset, fields = position
+        self._file.seek(offset)
+        self.__fields = list(fields)
+        self.__lookahead = self._readline()
+
+    def eof(self):
+        return not self.__fields and not self.__lookahead
+
+    def read_field(self):
+        if not self.__fields:
+            if not self.__lookahead:
+                raise EOFError
+            line = self.__lookahead.rstrip('\r\n')
+            self.__lookahead = self._readline()
+            self.__fields = next(csv.reader([line], skipinitialspace=True), [''])
+            self.__fields.reverse()
+        return self.__fields.pop()
+
+    def close(self):
+        self._file.close()
+
+
+class MappedInputChannel(InputChannel):
+
+    def _open(self, path, buffer_size):
+        with open(path, 'rb') as source_file:
+            self._file = mmap.mmap(source_file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+
+    def _readline(self):
+        return self._file.readline().decode('utf-8')
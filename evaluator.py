@@ -0,0 +1,407 @@
+from basictoken import BASICToken as Token
+from basicnode import Const, Var, ArrayRef, Unary, Binary, Call, Assign, \
+    ArrayAssign, Dim, Mat, Print, If, For, Next, Goto, Gosub, OnJump, Return, \
+    Stop, Data, Read, Restore, Open, Close, Input
+from basicarray import BASICArray
+from flowsignal import FlowSignal
+from matrix import mat
+from output import BASICOutput
+from channels import BASICChannels
+from hooks import WatchedSymbols
+from callcache import spaces
+import math
+import operator
+
+class BASICEvaluator:
+
+    binary_ops = {Token.PLUS: operator.add, Token.MINUS: operator.sub,
+                  Token.TIMES: operator.mul, Token.DIVIDE: operator.truediv,
+                  Token.MODULO: operator.mod,
+                  Token.EQUAL: operator.eq, Token.NOTEQUAL: operator.ne,
+                  Token.LESSER: operator.lt, Token.GREATER: operator.gt,
+                  Token.AND: lambda left, right: left and right,
+                  Token.OR: lambda left, right: left or right}
+
+    functions = {Token.INT: math.floor, Token.STR: str, Token.LEN: len,
+                 Token.VAL: lambda value: int(float(value))
+                            if float(value).is_integer() else float(value),
+                 Token.TAB: lambda value: spaces(int(value)),
+                 Token.LEFT: lambda instring, chars: instring[:chars],
+                 Token.RIGHT: lambda instring, chars: instring[-chars:]}
+
+    # The functions worth a call cache lookup; INT, LEN and TAB are
+    # cheaper to recompute
+    cached_functions = (Token.STR, Token.VAL, Token.LEFT, Token.RIGHT)
+
+    def __init__(self, basicdata, resolver, output=None, channels=None,
+                 on_write=None, call_cache=None):
+        self.__names = resolver.names
+        self.__symbol_table = [None] * len(resolver.names)
+        if on_write is not None:
+            self.__symbol_table = WatchedSymbols(self.__symbol_table,
+                                                 self.__names, on_write)
+        self.__array_names = resolver.array_names
+        self.__arrays = [None] * len(resolver.array_names)
+        self.__data = basicdata
+        self.__line_number = None
+        self.__loops = {}
+        self.output = output if output is not None else BASICOutput()
+        self.channels = channels if channels is not None else BASICChannels()
+        self.functions = BASICEvaluator.functions
+        # Set by a Budget's meter to callback(size, line_number), which
+        # raises if size more bytes would go over the run's memory limit
+        self.memory_check = None
+        if call_cache is not None and call_cache.size > 0:
+            self.functions = dict(self.functions)
+            for func in self.cached_functions:
+                self.functions[func] = call_cache.wrap(func, self.functions[func])
+
+        self.__exprs = {Const: self.__const, Var: self.__var,
+                        ArrayRef: self.__arrayref, Unary: self.__unary, Binary: self.__binary,
+                        Call: self.__evaluate_function}
+        self.__stmts = {Assign: self.__assignmentstmt, Print: self.__printstmt,
+                        ArrayAssign: self.__arrayassignmentstmt, Dim: self.__dimstmt,
+                        Mat: self.__matstmt,
+                        If: self.__ifstmt, For: self.__forstmt,
+                        Next: self.__nextstmt, Goto: self.__gotostmt,
+                        Gosub: self.__gosubstmt, OnJump: self.__ongosubstmt,
+                        Return: self.__returnstmt, Stop: self.__stopstmt,
+                        Data: self.__datastmt, Read: self.__readstmt,
+                        Restore: self.__restorestmt, Open: self.__openstmt,
+                        Close: self.__closestmt, Input: self.__inputstmt}
+
+    @property
+    def symbol_table(self):
+        return self.__symbol_table
+
+    @property
+    def arrays(self):
+        return self.__arrays
+
+    def state(self):
+        # What a run has built up between lines, for a snapshot
+        self.output.flush()
+        return {'symbols': list(self.__symbol_table),
+                'arrays': [None if array is None else array.state()
+                           for array in self.__arrays],
+                'loops': dict(self.__loops),
+                'data': self.__data.position,
+                'column': self.output.column,
+                'channels': self.channels.state()}
+
+    def restore(self, state):
+        # The lists are filled in place, as the VM holds on to them; the
+        # symbol table is filled without reporting writes
+        if len(state['symbols']) != len(self.__symbol_table) or \
+           len(state['arrays']) != len(self.__arrays):
+            raise ValueError('Snapshot does not match its program')
+        list.__setitem__(self.__symbol_table, slice(None), state['symbols'])
+        self.__arrays[:] = [None if array is None else BASICArray.from_state(array)
+                            for array in state['arrays']]
+        self.__loops.clear()
+        self.__loops.update(state['loops'])
+        self.__data.position = state['data']
+        self.output.column = state['column']
+        self.channels.restore(state['channels'])
+
+    def undefined(self, slot, line_number):
+        return RuntimeError('Variable ' + self.__names[slot] + ' is not defined' +
+                            ' in line ' + str(line_number))
+
+    def execute(self, stmts, line_number):
+        self.__line_number = line_number
+        return self.__execute(stmts)
+
+    def __execute(self, stmts):
+        for stmt in stmts:
+            flow = self.__stmts[type(stmt)](stmt)
+            if flow:
+                return flow
+
+        return None
+
+    def __eval(self, expr):
+        return self.__exprs[type(expr)](expr)
+
+    def __const(self, expr):
+        return expr.value
+
+    def __var(self, expr):
+        value = self.__symbol_table[expr.slot]
+        if value is None:
+            raise self.undefined(expr.slot, self.__line_number)
+        return value
+
+    def array(self, slot, line_number):
+        array = self.__arrays[slot]
+        if array is None:
+            raise RuntimeError('Array ' + self.__array_names[slot] +
+                               ' is not dimensioned in line ' + str(line_number))
+        return array
+
+    def __arrayref(self, expr):
+        array = self.array(expr.slot, self.__line_number)
+        try:
+            return array.get([self.__eval(index) for index in expr.indices])
+
+        except (IndexError, TypeError) as err:
+            raise type(err)(str(err) + ' in line ' + str(self.__line_number))
+
+    def __unary(self, expr):
+        if expr.op == Token.MINUS:
+            return -self.__eval(expr.operand)
+
+        return not self.__eval(expr.operand)
+
+    def __binary(self, expr):
+        return self.binary_ops[expr.op](self.__eval(expr.left),
+                                        self.__eval(expr.right))
+
+    def __assignmentstmt(self, stmt):
+        self.__symbol_table[stmt.slot] = self.__eval(stmt.expr)
+
+    def __arrayassignmentstmt(self, stmt):
+        array = self.array(stmt.slot, self.__line_number)
+        try:
+            array.set([self.__eval(index) for index in stmt.indices],
+                      self.__eval(stmt.expr))
+
+        except (IndexError, TypeError) as err:
+            raise type(err)(str(err) + ' in line ' + str(self.__line_number))
+
+    def __dimstmt(self, stmt):
+        for (name, dims), slot in zip(stmt.arrays, stmt.slots):
+            if self.__arrays[slot] is not None:
+                raise RuntimeError('Array ' + name + ' is already dimensioned' +
+                                   ' in line ' + str(self.__line_number))
+            try:
+                self.__arrays[slot] = BASICArray(name, [self.__eval(dim)
+                                                        for dim in dims],
+                                                 self.__reserve)
+
+            except (IndexError, TypeError) as err:
+                raise type(err)(str(err) + ' in line ' + str(self.__line_number))
+
+    def __reserve(self, size):
+        if self.memory_check is not None:
+            self.memory_check(size, self.__line_number)
+
+    def __matstmt(self, stmt):
+        target = self.array(stmt.slot, self.__line_number)
+        operands = [self.array(slot, self.__line_number) for slot in stmt.slots]
+        scalar = None
+        if stmt.scalar is not None:
+            scalar = self.__eval(stmt.scalar)
+
+        try:
+            mat(target, stmt.op, operands, scalar)
+
+        except (IndexError, TypeError) as err:
+            raise type(err)(str(err) + ' in line ' + str(self.__line_number))
+
+    def __printstmt(self, stmt):
+        filenum = None
+        if stmt.filenum is not None:
+            filenum = self.__eval(stmt.filenum)
+
+        for expr, prntTab in stmt.items:
+            self.print_value(self.__eval(expr), prntTab, filenum)
+
+        if stmt.newline:
+            self.print_newline(filenum)
+
+    def print_value(self, value, prntTab, filenum=None):
+        # One print column is shared by the console and PRINT # files
+        output = self.output
+        write = output.write if filenum is None \
+            else self.__channel(self.channels.output, filenum).write
+
+        if prntTab:
+            if output.column >= len(value):
+                write("\n")
+                output.column = 0
+
+            current_pr_column = len(value) - output.column
+            output.column = len(value) - 1
+            if current_pr_column > 1:
+                write(spaces(current_pr_column-1))
+        else:
+            value = str(value)
+            output.column += len(value)
+            write(value)
+
+    def print_newline(self, filenum=None):
+        if filenum is not None:
+            self.__channel(self.channels.output, filenum).write("\n")
+        else:
+            self.output.write("\n")
+        self.output.column = 0
+
+    def __returnstmt(self, stmt):
+        return FlowSignal(ftype=FlowSignal.RETURN)
+
+    def __stopstmt(self, stmt):
+        self.close()
+        return FlowSignal(ftype=FlowSignal.STOP)
+
+    def close(self):
+        self.channels.close()
+        self.output.flush()
+
+    def __channel(self, lookup, filenum):
+        try:
+            return lookup(filenum)
+
+        except RuntimeError as err:
+            raise RuntimeError(str(err) + ' in line ' + str(self.__line_number))
+
+    def __openstmt(self, stmt):
+        path = self.__eval(stmt.path)
+        if not isinstance(path, str):
+            # A number would be taken by open() as a descriptor of the host
+            raise RuntimeError('Type mismatch in OPEN, file name must be a' +
+                               ' string in line ' + str(self.__line_number))
+        buffer_size = None
+        if stmt.buffer_size is not None:
+            buffer_size = int(self.__eval(stmt.buffer_size))
+
+        try:
+            self.channels.open(self.__eval(stmt.filenum), path, stmt.mode,
+                               buffer_size)
+
+        except OSError as err:
+            raise RuntimeError('Cannot open file ' + str(path) + ': ' +
+                               str(err.strerror) + ' in line ' +
+                               str(self.__line_number))
+
+        except RuntimeError as err:
+            raise RuntimeError(str(err) + ' in line ' + str(self.__line_number))
+
+    def __closestmt(self, stmt):
+        if not stmt.filenums:
+            self.channels.close()
+        for filenum in stmt.filenums:
+            self.channels.close(self.__eval(filenum))
+
+    def __inputstmt(self, stmt):
+        filenum = self.__eval(stmt.filenum)
+        channel = self.__channel(self.channels.input, filenum)
+
+        for name, slot in zip(stmt.names, stmt.slots):
+            try:
+                value = channel.read_field()
+
+            except EOFError:
+                raise RuntimeError('Input past end of file #' + str(filenum) +
+                                   ' in line ' + str(self.__line_number))
+
+            # Fields are numbers for numeric variables, and must read as one
+            if not name.endswith('$'):
+                try:
+                    value = int(value)
+                except ValueError:
+                    try:
+                        value = float(value)
+                    except ValueError:
+                        raise RuntimeError('Type mismatch reading ' + repr(value) +
+                                           ' into ' + name + ' from file #' +
+                                           str(filenum) + ' in line ' +
+                                           str(self.__line_number))
+            self.__symbol_table[slot] = value
+
+    def eof(self, filenum, line_number):
+        self.__line_number = line_number
+        return self.__channel(self.channels.input, filenum).eof()
+
+    def __datastmt(self, stmt):
+        return None
+
+    def __readstmt(self, stmt):
+        for slot in stmt.slots:
+            self.__symbol_table[slot] = self.__data.readData(self.__line_number)
+
+    def __restorestmt(self, stmt):
+        if stmt.target is None:
+            self.__data.restore(0)
+        else:
+            self.__data.restore(self.__eval(stmt.target))
+
+    def __gotostmt(self, stmt):
+        return FlowSignal(ftarget=self.__eval(stmt.target))
+
+    def __gosubstmt(self, stmt):
+        return FlowSignal(ftarget=self.__eval(stmt.target),
+                          ftype=FlowSignal.GOSUB)
+
+    def __ongosubstmt(self, stmt):
+        index = self.__eval(stmt.expr)
+
+        if 1 <= index <= len(stmt.targets):
+            target = self.__eval(stmt.targets[int(index) - 1])
+            if stmt.gosub:
+                return FlowSignal(ftarget=target, ftype=FlowSignal.GOSUB)
+            return FlowSignal(ftarget=target)
+
+        return None
+
+    def __ifstmt(self, stmt):
+        if self.__eval(stmt.cond):
+            if stmt.then_target is not None:
+                return FlowSignal(ftarget=self.__eval(stmt.then_target))
+            return self.__execute(stmt.then_body)
+
+        if stmt.else_target is not None:
+            return FlowSignal(ftarget=self.__eval(stmt.else_target))
+        elif stmt.else_body is not None:
+            return self.__execute(stmt.else_body)
+
+        return None
+
+    def __forstmt(self, stmt):
+        # The end and step are fixed when the loop is entered; the loop
+        # frame keeps them for NEXT, which steps and tests in place
+        loop_variable = stmt.slot
+
+        end_val = self.__eval(stmt.end)
+
+        step = 1
+        if stmt.step is not None:
+            step = self.__eval(stmt.step)
+
+            if step == 0:
+                raise IndexError('Zero step value supplied for loop' +
+                                 ' in line ' + str(self.__line_number))
+
+        start_val = self.__eval(stmt.start)
+        self.__symbol_table[loop_variable] = start_val
+
+        if (step > 0 and start_val > end_val) or (step < 0 and start_val < end_val):
+            self.__loops.pop(loop_variable, None)
+            return FlowSignal(ftype=FlowSignal.LOOP_SKIP,
+                              ftarget=stmt.var, floop_stmt=stmt)
+
+        self.__loops[loop_variable] = (end_val, step)
+        return FlowSignal(ftype=FlowSignal.LOOP_BEGIN,floop_var=stmt.var,
+                          floop_stmt=stmt)
+
+    def __nextstmt(self, stmt):
+        loop_variable = stmt.slot
+        if loop_variable not in self.__loops:
+            raise RuntimeError('NEXT without FOR for loop variable ' +
+                               stmt.var + ' in line ' + str(self.__line_number))
+
+        end_val, step = self.__loops[loop_variable]
+        value = self.__symbol_table[loop_variable] + step
+        self.__symbol_table[loop_variable] = value
+
+        if (step > 0 and value > end_val) or (step < 0 and value < end_val):
+            # The loop is done, and the rest of the line runs
+            del self.__loops[loop_variable]
+            return None
+
+        return FlowSignal(ftype=FlowSignal.LOOP_REPEAT,floop_var=stmt.var)
+
+    def __evaluate_function(self, expr):
+        if expr.func == Token.EOF:
+            return self.eof(self.__eval(expr.args[0]), self.__line_number)
+        return self.functions[expr.func](*[self.__eval(arg) for arg in expr.args])
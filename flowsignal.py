@@ -8,7 +8,8 @@ class FlowSignal:
     STOP               = 6
     EXECUTE            = 7
 
-    def __init__(self, ftarget=None, ftype=SIMPLE_JUMP, floop_var=None):
+    def __init__(self, ftarget=None, ftype=SIMPLE_JUMP, floop_var=None,
+                 floop_stmt=None):
         if ftype not in [self.GOSUB, self.SIMPLE_JUMP, self.LOOP_BEGIN,
                          self.LOOP_REPEAT, self.RETURN,
                          self.LOOP_SKIP, self.STOP, self.EXECUTE]:
@@ -22,4 +23,7 @@ class FlowSignal:
             raise TypeError("Target wrongly supplied for flow signal " + str(ftype))
         self.ftype = ftype
         self.ftarget = ftarget
-        self.floop_var = floop_var
\ No newline at end of file
+        self.floop_var = floop_var
+        # The FOR statement a loop signal comes from, so that the program
+        # can find where on its line the loop body starts
+        self.floop_stmt = floop_stmt
\ No newline at end of file
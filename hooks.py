@@ -0,0 +1,139 @@
+from collections import deque
+import time
+
+class Hooks:
+
+    # Callbacks for a program's runs, by event:
+    #   line    callback(line_number), before each line runs
+    #   write   callback(name, value), on each write to a scalar variable
+    #   flow    callback(line_number, flowsignal), tree engine only
+    #   output  callback(text), for console PRINT output
+    # Nothing is added to a run for events with no callbacks.
+
+    LINE, WRITE, FLOW, OUTPUT = 'line', 'write', 'flow', 'output'
+    events = (LINE, WRITE, FLOW, OUTPUT)
+
+    # What trace() records by default: every event both engines support, so
+    # a default trace does not tie the program to the tree engine
+    trace_events = (LINE, WRITE, OUTPUT)
+
+    def __init__(self):
+        self.__callbacks = {event: [] for event in self.events}
+
+    def __contains__(self, event):
+        return bool(self.__callbacks[event])
+
+    def on(self, event, callback, every=1):
+        # With every=n only one event in n reaches the callback. The
+        # callback given is also what off() takes to remove it.
+        if event not in self.__callbacks:
+            raise ValueError('Unknown hook event: ' + str(event))
+        if every < 1:
+            raise ValueError('Hook sampling interval must be at least 1')
+
+        self.__callbacks[event].append((callback, self.__sampled(callback, every)))
+        return callback
+
+    def off(self, event, callback):
+        self.__callbacks[event] = [(registered, dispatch)
+                                   for registered, dispatch in self.__callbacks[event]
+                                   if registered is not callback]
+
+    def clear(self):
+        for event in self.events:
+            self.__callbacks[event] = []
+
+    def trace(self, capacity, events=None):
+        # Records the given events in a new ring buffer; flow events are
+        # only recorded when asked for, and then only the tree engine runs
+        buffer = TraceBuffer(capacity)
+        for event in events or self.trace_events:
+            self.on(event, buffer.recorder(event))
+        return buffer
+
+    def __sampled(self, callback, every):
+        if every == 1:
+            return callback
+
+        count = [0]
+
+        def sampled(*args):
+            count[0] += 1
+            if count[0] == every:
+                count[0] = 0
+                callback(*args)
+
+        return sampled
+
+    def dispatcher(self, event):
+        # A single callable for the event's callbacks as registered now,
+        # or None if there are none
+        callbacks = [dispatch for registered, dispatch in self.__callbacks[event]]
+        if not callbacks:
+            return None
+        if len(callbacks) == 1:
+            return callbacks[0]
+
+        def dispatch(*args):
+            for callback in callbacks:
+                callback(*args)
+
+        return dispatch
+
+    def wrap(self, execute_line):
+        # Returns the program loop's line executor with line and flow
+        # callbacks around it
+        on_line = self.dispatcher(self.LINE)
+        on_flow = self.dispatcher(self.FLOW)
+
+        def hooked(line_number):
+            if on_line:
+                on_line(line_number)
+            flowsignal = execute_line(line_number)
+            if flowsignal and on_flow:
+                on_flow(line_number, flowsignal)
+            return flowsignal
+
+        return hooked
+
+
+class WatchedSymbols(list):
+
+    # A symbol table that reports every write, used in place of a plain
+    # list only while write callbacks are registered
+
+    def __init__(self, values, names, on_write):
+        list.__init__(self, values)
+        self.__names = names
+        self.__on_write = on_write
+
+    def __setitem__(self, slot, value):
+        list.__setitem__(self, slot, value)
+        self.__on_write(self.__names[slot], value)
+
+
+class TraceBuffer:
+
+    # The last capacity events, as (time, event, arguments) tuples
+
+    def __init__(self, capacity, timer=time.perf_counter):
+        self.__entries = deque(maxlen=capacity)
+        self.timer = timer
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __iter__(self):
+        return iter(list(self.__entries))
+
+    def recorder(self, event):
+        append = self.__entries.append
+        timer = self.timer
+
+        def record(*args):
+            append((timer(), event, args))
+
+        return record
+
+    def clear(self):
+        self.__entries.clear()
@@ -0,0 +1,195 @@
+import basicnode
+import basicparser
+import basictoken
+import optimizer
+import resolver
+import vm
+from resolver import Resolver
+from vm import Bytecode, Op
+import gc
+import hashlib
+import marshal
+import mmap
+import os
+import program
+
+# A cache file is the magic number, a format version, a tag for the
+# interpreter that wrote it, the SHA-256 of the source it was built from,
+# then the program image in marshal format. The image is plain data only:
+# nodes are tuples starting with their class name as bytes, and are only
+# ever rebuilt as basicnode classes, so a cache file cannot run code the
+# way a pickle can.
+MAGIC = b'BASC'
+VERSION = 4
+TAG_SIZE = 8
+HEADER_SIZE = len(MAGIC) + 1 + TAG_SIZE + 32
+
+# Images hold parse trees and bytecode, whose layout is defined by these
+# modules; any change to them makes older caches stale
+format_modules = (basicnode, basicparser, basictoken, optimizer, resolver, vm)
+_tag = None
+
+
+def interpreter_tag():
+    global _tag
+    if _tag is None:
+        digest = hashlib.sha256()
+        for module in format_modules:
+            with open(module.__file__, 'rb') as module_file:
+                digest.update(module_file.read())
+        _tag = digest.digest()[:TAG_SIZE]
+    return _tag
+
+
+node_classes = {name: cls for name, cls in vars(basicnode).items()
+                if isinstance(cls, type) and cls.__module__ == basicnode.__name__}
+
+
+def _encode(value):
+    value_type = type(value)
+    if value_type == list:
+        return [_encode(item) for item in value]
+    elif value_type == tuple:
+        return tuple(_encode(item) for item in value)
+    elif value_type == dict:
+        return {key: _encode(item) for key, item in value.items()}
+    elif value_type in (type(None), bool, int, float, str):
+        return value
+    elif value_type.__name__ in node_classes and \
+         node_classes[value_type.__name__] is value_type:
+        return (value_type.__name__.encode('ascii'),) + \
+            tuple(_encode(getattr(value, slot)) for slot in value_type.__slots__)
+    raise TypeError('Cannot store ' + value_type.__name__ + ' in an image')
+
+
+def _decode(value):
+    # Values that are not containers come back from marshal as they are
+    # and are passed over without a call
+    value_type = type(value)
+    if value_type == tuple:
+        if value and type(value[0]) == bytes:
+            cls = node_classes.get(value[0].decode('ascii'))
+            if cls is None or len(value) != len(cls.__slots__) + 1:
+                raise ValueError('Unknown node in image')
+            node = cls.__new__(cls)
+            for slot, item in zip(cls.__slots__, value[1:]):
+                setattr(node, slot, _decode(item) if type(item) in _containers else item)
+            return node
+        return tuple([_decode(item) if type(item) in _containers else item
+                      for item in value])
+    elif value_type == list:
+        return [_decode(item) if type(item) in _containers else item
+                for item in value]
+    elif value_type == dict:
+        return {key: _decode(item) if type(item) in _containers else item
+                for key, item in value.items()}
+    return value
+
+
+_containers = {list, tuple, dict}
+
+
+def dumps(image):
+    bytecode = image['bytecode'] or Bytecode([], [], [])
+    return marshal.dumps({'optimize': image['optimize'],
+                          'tokens': image['tokens'],
+                          'compiled': _encode(image['compiled']),
+                          'names': image['resolver'].names,
+                          'array_names': image['resolver'].array_names,
+                          'data': image['data'],
+                          'code': [(op, _encode(arg)) if op == Op.EXEC else (op, arg)
+                                   for op, arg in bytecode.code],
+                          'line_numbers': bytecode.line_numbers,
+                          'line_starts': bytecode.line_starts})
+
+
+def loads(data):
+    # Nothing built here can form a cycle, so the collector is kept from
+    # walking the many new objects while they are made
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _loads(data)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _loads(data):
+    stored = marshal.loads(data)
+    resolver = Resolver()
+    for name in stored['names']:
+        resolver.slot(name)
+    for name in stored['array_names']:
+        resolver.array_slot(name)
+
+    return {'optimize': stored['optimize'],
+            'tokens': stored['tokens'],
+            'compiled': _decode(stored['compiled']),
+            'resolver': resolver,
+            'data': stored['data'],
+            'bytecode': Bytecode(_decode_code(stored['code']),
+                                 stored['line_numbers'],
+                                 stored['line_starts']) if stored['code'] else None}
+
+
+def _decode_code(code):
+    # Only EXEC instructions carry statements; the rest are plain data
+    # already and are kept as marshal returns them
+    for index, (op, arg) in enumerate(code):
+        if op == Op.EXEC:
+            code[index] = (op, _decode(arg))
+    return code
+
+
+def cache_path(source_path):
+    return os.path.splitext(source_path)[0] + '.basc'
+
+
+def source_hash(source):
+    return hashlib.sha256(source).digest()
+
+
+def header(digest):
+    return MAGIC + bytes([VERSION]) + interpreter_tag() + digest
+
+
+def load(path, digest):
+    # Returns the cached Program, or None if there is no usable cache for
+    # this exact source
+    try:
+        with open(path, 'rb') as cache_file:
+            with mmap.mmap(cache_file.fileno(), 0,
+                           access=mmap.ACCESS_READ) as cache:
+                if cache[:HEADER_SIZE] != header(digest):
+                    return None
+                # Both views are released before the mapping is closed,
+                # including when the image turns out to be corrupt
+                with memoryview(cache) as view, view[HEADER_SIZE:] as body:
+                    image = loads(body)
+
+    except (OSError, ValueError, EOFError, KeyError, AttributeError,
+            TypeError):
+        return None
+
+    cached = program.Program(image['optimize'])
+    cached.load_image(image)
+    return cached
+
+
+def save(path, digest, program):
+    # The cache is rewritten under a temporary name and moved into place,
+    # so a concurrent run never maps a half-written file. Failing to write
+    # it only costs the next run a recompile.
+    temp_path = path + '.' + str(os.getpid()) + '.tmp'
+    try:
+        with open(temp_path, 'wb') as cache_file:
+            cache_file.write(header(digest))
+            cache_file.write(dumps(program.image()))
+        os.replace(temp_path, path)
+
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
@@ -1,6 +1,14 @@
 from basictoken import BASICToken as Token
 from lexer import Lexer
 from program import Program
+from profiler import LineProfiler
+from callcache import CallCache
+from budget import Budget
+import imagecache
+import argparse
+import mmap
+import os
+import sys
 
 def main():
 
@@ -11,18 +19,130 @@ def main():
 
         stmt = input('>>> ')
 
-        tokenlist = lexer.tokenize(stmt)
-        if len(tokenlist) > 0:
-            if tokenlist[0].category == Token.EXIT:
-                break
-            elif tokenlist[0].category == Token.UNSIGNEDINT\
-                and len(tokenlist) > 1:
-                program.add_stmt(tokenlist)
-            elif tokenlist[0].category == Token.UNSIGNEDINT \
-                    and len(tokenlist) == 1:
-                program.delete_statement(int(tokenlist[0].lexeme))
-            elif tokenlist[0].category == Token.RUN:
-                program.execute()
+        try:
+            tokenlist = lexer.tokenize(stmt)
+            if len(tokenlist) > 0:
+                if tokenlist[0].category == Token.EXIT:
+                    break
+                elif tokenlist[0].category == Token.UNSIGNEDINT\
+                    and len(tokenlist) > 1:
+                    program.add_stmt(tokenlist)
+                elif tokenlist[0].category == Token.UNSIGNEDINT \
+                        and len(tokenlist) == 1:
+                    program.delete_statement(int(tokenlist[0].lexeme))
+                elif tokenlist[0].category == Token.RUN:
+                    program.execute()
+
+        # The session and the program entered so far survive a mistake
+        except (SyntaxError, RuntimeError, ValueError, TypeError,
+                IndexError, KeyError, ZeroDivisionError, OSError) as err:
+            sys.stdout.flush()
+            print(str(err))
+
+def load(program, source, lexer=None):
+    if lexer is None:
+        lexer = Lexer()
+
+    tokenlists = []
+    for line_number, tokenlist in lexer.tokenize_source(source):
+        if tokenlist[0].category != Token.UNSIGNEDINT:
+            raise SyntaxError('Missing line number in source line ' +
+                              str(line_number))
+        if len(tokenlist) > 1:
+            tokenlists.append(tokenlist)
+
+    program.add_stmts(tokenlists)
+    return program
+
+def load_cached(source, path):
+    # Reuses the .basc image next to the source file when it was built from
+    # identical source, and rebuilds it otherwise
+    image_path = imagecache.cache_path(path)
+    digest = imagecache.source_hash(source)
+    program = imagecache.load(image_path, digest)
+    if program is None:
+        program = load(Program(), source)
+        imagecache.save(image_path, digest, program)
+    return program
+
+def run_file(path, engine="tree", profile=False, cache=True, output=None,
+             profile_out=None, call_cache=0, budget=None):
+    try:
+        with open(path, 'rb') as source_file:
+            if os.fstat(source_file.fileno()).st_size == 0:
+                program = Program()
+            else:
+                with mmap.mmap(source_file.fileno(), 0,
+                               access=mmap.ACCESS_READ) as source:
+                    program = load_cached(source, path) if cache \
+                        else load(Program(), source)
+
+        program.call_cache = CallCache(call_cache)
+        profiler = LineProfiler() if profile or profile_out else None
+        try:
+            program.execute(engine=engine, output=output, profiler=profiler,
+                            budget=budget)
+
+        finally:
+            # A run that fails part way still reports the lines it ran
+            if profiler is not None and profiler.counts:
+                sys.stdout.flush()
+                if profile:
+                    profiler.report(sys.stderr, describe=program.str_statement)
+                if profile_out and profile_out.endswith('.json'):
+                    profiler.dump_json(profile_out)
+                elif profile_out:
+                    profiler.dump_stats(profile_out, path)
+
+    except (OSError, SyntaxError, RuntimeError, ValueError, TypeError,
+            IndexError, ZeroDivisionError) as err:
+        sys.stdout.flush()
+        print(path + ': ' + str(err), file=sys.stderr)
+        return 1
+
+    finally:
+        sys.stdout.flush()
+
+    return 0
+
+def batch(argv=None):
+    parser = argparse.ArgumentParser(description='Run a BASIC program file.')
+    parser.add_argument('file', help='BASIC source file to run')
+    parser.add_argument('--engine', choices=['tree', 'vm'], default='tree',
+                        help='execution engine (default: tree)')
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help='do not read or write the precompiled .basc file')
+    parser.add_argument('--profile', action='store_true',
+                        help='report the hottest lines on stderr (tree engine)')
+    parser.add_argument('--profile-out', metavar='FILE',
+                        help='write line timings as JSON if FILE ends in .json,'
+                             ' otherwise in pstats format')
+    parser.add_argument('--call-cache', type=int, default=0, metavar='SIZE',
+                        help='cache the results of up to SIZE STR$, VAL, LEFT$'
+                             ' and RIGHT$ calls (default: 0, off)')
+    parser.add_argument('--max-lines', type=int, metavar='N',
+                        help='stop after running N lines')
+    parser.add_argument('--max-seconds', type=float, metavar='S',
+                        help='stop after S seconds')
+    parser.add_argument('--max-gosub-depth', type=int, metavar='N',
+                        help='stop when more than N GOSUBs are waiting to return')
+    parser.add_argument('--max-memory', type=int, metavar='BYTES',
+                        help='stop when variables and arrays hold more than BYTES')
+    args = parser.parse_args(argv)
+    if args.call_cache < 0:
+        parser.error('--call-cache cannot be negative')
+
+    budget = None
+    limits = (args.max_lines, args.max_seconds, args.max_gosub_depth,
+              args.max_memory)
+    if any(limit is not None for limit in limits):
+        budget = Budget(*limits)
+
+    return run_file(args.file, engine=args.engine, profile=args.profile,
+                    cache=args.cache, profile_out=args.profile_out,
+                    call_cache=args.call_cache, budget=budget)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        sys.exit(batch())
+    main()
@@ -0,0 +1,139 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from lexer import Lexer
+from output import BASICOutput
+from program import Program
+import hashlib
+import io
+import signal
+import time
+import interpreter
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class JobResult:
+
+    # status is 0 when the program ran to the end or STOP, 1 otherwise,
+    # in which case error holds the message
+
+    __slots__ = ('job', 'status', 'output', 'error', 'seconds')
+
+    def __init__(self, job, status, output, error, seconds):
+        self.job = job
+        self.status = status
+        self.output = output
+        self.error = error
+        self.seconds = seconds
+
+    def __repr__(self):
+        return 'JobResult(%r, status=%d, seconds=%.3f)' % (self.job, self.status,
+                                                           self.seconds)
+
+
+class JobTimeout(BaseException):
+    # Not an Exception, so that the interpreter's own broad handlers, such
+    # as the optimizer's constant folding, cannot swallow a timeout
+    pass
+
+
+def run_many(jobs, workers=None, engine="tree", timeout=None, memory_limit=None,
+             budget=None):
+    # Runs independent programs on a pool of worker processes and returns
+    # a JobResult for each, in the order given. A job is a path to a .bas
+    # file (a str with no newline, or an os.PathLike) or the source itself
+    # (bytes, or a str with newlines). timeout is in seconds of wall time
+    # per job; memory_limit caps each worker's address space in bytes.
+    # Both are enforced where the platform supports it (POSIX). A Budget,
+    # checked by the interpreter itself, applies to every job's run.
+    jobs = list(jobs)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                             initargs=(memory_limit,)) as pool:
+        futures = [pool.submit(_run_job, job, engine, timeout, budget) for job in jobs]
+
+        results = []
+        for job, future in zip(jobs, futures):
+            try:
+                status, output, error, seconds = future.result()
+
+            except BrokenProcessPool:
+                status, output, error, seconds = 1, '', 'Worker process died', 0.0
+
+            results.append(JobResult(job, status, output, error, seconds))
+
+    return results
+
+
+# Per worker process state: one lexer, and the programs already compiled
+# there by source hash, so a worker given the same program again only
+# runs it
+
+_lexer = None
+_programs = {}
+_program_cache_size = 128
+
+
+def _start_worker(memory_limit):
+    global _lexer
+    _lexer = Lexer()
+    if memory_limit is not None and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+
+def _read(job):
+    if isinstance(job, bytes):
+        return job
+    if isinstance(job, str) and '\n' in job:
+        return job.encode('utf-8')
+    with open(job, 'rb') as source_file:
+        return source_file.read()
+
+
+def _program(source):
+    digest = hashlib.sha256(source).digest()
+    program = _programs.get(digest)
+    if program is None:
+        program = interpreter.load(Program(), source, _lexer)
+        if len(_programs) >= _program_cache_size:
+            _programs.pop(next(iter(_programs)))
+        _programs[digest] = program
+    return program
+
+
+def _timed_out(signum, frame):
+    raise JobTimeout()
+
+
+def _run_job(job, engine, timeout, budget):
+    stream = io.BytesIO()
+    status, error = 0, None
+    use_alarm = timeout is not None and hasattr(signal, 'setitimer')
+    start = time.perf_counter()
+
+    try:
+        if use_alarm:
+            signal.signal(signal.SIGALRM, _timed_out)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            _program(_read(job)).execute(engine=engine,
+                                         output=BASICOutput(stream),
+                                         budget=budget)
+        finally:
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+
+    except JobTimeout:
+        status, error = 1, 'Timed out after ' + str(timeout) + ' seconds'
+
+    except MemoryError:
+        status, error = 1, 'Out of memory'
+
+    except (OSError, SyntaxError, RuntimeError, ValueError, TypeError,
+            IndexError, KeyError, ZeroDivisionError, OverflowError) as err:
+        status, error = 1, str(err)
+
+    return (status, stream.getvalue().decode('utf-8', 'replace'), error,
+            time.perf_counter() - start)
@@ -1,105 +1,163 @@
 from basictoken import BASICToken as Token
+import re
 
 class Lexer:
 
-    def __init__(self):
-
-        self.__column = 0 
-        self.__stmt = ''   
+    # Leading whitespace is absorbed into each match; the groups, tried in
+    # order, are strings, numbers, names, operators and the two error cases
+    __token_pattern = re.compile(r'''\s*(?:
+          "([^"]*)"
+        | (\d+(?:\.\d*)?)
+        | ([^\W\d_][\w$]*)
+        | (<>|[=()+\-*/<>,:%#;])
+        | (")
+        | (.)
+        )''', re.VERBOSE | re.DOTALL)
+
+    # The same scanner over a whole buffer, with the end of each line
+    # (or of the buffer) matched as a group of its own
+    __source_pattern = r'''[ \t\r\f\v]*(?:
+          "([^"\n]*)"
+        | (\d+(?:\.\d*)?)
+        | ([^\W\d_][\w$]*)
+        | (<>|[=()+\-*/<>,:%#;])
+        | (")
+        | (\n|\Z)
+        | (.)
+        )'''
+    __text_pattern = re.compile(__source_pattern, re.VERBOSE | re.DOTALL)
+
+    # In bytes, \w is ASCII only, so a name is any run of word characters
+    # and non-ASCII bytes, decoded and then held to the text pattern's rule
+    __name_pattern = re.compile(r'[^\W\d_][\w$]*')
+    __bytes_pattern = re.compile(
+        __source_pattern.replace(r'[^\W\d_][\w$]*',
+                                 r'[A-Za-z\x80-\xff][\w$\x80-\xff]*').encode(),
+        re.VERBOSE | re.DOTALL)
+
+    __STRING, __NUMBER, __NAME, __SMALL, __QUOTE, __LINE_END = 1, 2, 3, 4, 5, 6
 
     def tokenize(self, stmt):
-        self.__stmt = stmt
-        self.__column = 0
         tokenlist = []
+        append = tokenlist.append
+        keywords = Token.keywords
+        smalltokens = Token.smalltokens
+
+        # Scanning stops before any trailing whitespace, which the leading
+        # \s* of the pattern would otherwise leave unmatched
+        end = len(stmt.rstrip())
+        for match in self.__token_pattern.finditer(stmt, 0, end):
+            kind = match.lastindex
+            lexeme = match.group(kind)
+
+            if kind == self.__NAME:
+                lexeme = lexeme.upper()
+                append(Token(match.start(kind), keywords.get(lexeme, Token.NAME), lexeme))
+
+            elif kind == self.__SMALL:
+                append(Token(match.start(kind), smalltokens[lexeme], lexeme))
+
+            elif kind == self.__NUMBER:
+                if '.' in lexeme:
+                    append(Token(match.start(kind), Token.UNSIGNEDFLOAT, lexeme))
+                else:
+                    append(Token(match.start(kind), Token.UNSIGNEDINT, lexeme))
 
-        c = self.__get_next_char()
-        while c != '':
-            while c.isspace():
-                c = self.__get_next_char()
-
-            token = Token(self.__column - 1, None, '')
+            elif kind == self.__STRING:
+                append(Token(match.start(kind) - 1, Token.STRING, lexeme))
 
-            if c == '"':
-                token.category = Token.STRING
-                c = self.__get_next_char()  
-                if c == '"':
-                    c = self.__get_next_char()
+            elif kind == self.__QUOTE:
+                raise SyntaxError("Mismatched quotes")
 
-                else:
-                    while True:
-                        token.lexeme += c  
-                        c = self.__get_next_char()
-
-                        if c == '':
-                            raise SyntaxError("Mismatched quotes")
-
-                        if c == '"':
-                            c = self.__get_next_char()
-                            break
-
-            elif c.isdigit():
-                token.category = Token.UNSIGNEDINT
-                found_point = False
-                while True:
-                    token.lexeme += c 
-                    c = self.__get_next_char()
-                    if not c.isdigit():
-                        if c == '.':
-                            if not found_point:
-                                found_point = True
-                                token.category = Token.UNSIGNEDFLOAT
-
-                            else:
-                                break
-
-                        else:
-                            break
-
-            elif c.isalpha():
-                while True:
-                    token.lexeme += c  
-                    c = self.__get_next_char()
-                    if not ((c.isalpha() or c.isdigit()) or c == '_' or c == '$'):
-                        break
-
-                token.lexeme = token.lexeme.upper()
-                if token.lexeme in Token.keywords:
-                    token.category = Token.keywords[token.lexeme]
+            else:
+                raise SyntaxError('Syntax error')
 
-                else:
-                    token.category = Token.NAME
+        # Trailing whitespace has always produced an empty token with no
+        # category; it is kept so the token stream is unchanged
+        if end < len(stmt):
+            append(Token(len(stmt) - 1, None, ''))
 
-            elif c in Token.smalltokens:
-                save = c
-                c = self.__get_next_char()  
-                twochar = save + c
+        return tokenlist
 
-                if twochar in Token.smalltokens:
-                    token.category = Token.smalltokens[twochar]
-                    token.lexeme = twochar
-                    c = self.__get_next_char()
+    def tokenize_source(self, text):
+        # Yields (line number, token list) for each non-blank line of a
+        # whole program in one pass. text may be a str or any bytes-like
+        # buffer, such as a memoryview or an mmap of a source file; with
+        # bytes, lexemes are decoded one at a time and columns are byte
+        # offsets. Lines end at \n, and numbering starts at 1
+        if isinstance(text, str):
+            pattern = self.__text_pattern
+            decode = str
+        else:
+            pattern = self.__bytes_pattern
+            decode = self.__decode
 
+        tokenlist = []
+        append = tokenlist.append
+        keywords = Token.keywords
+        smalltokens = Token.smalltokens
+        line_number = 1
+        line_start = 0
+
+        for match in pattern.finditer(text):
+            kind = match.lastindex
+
+            if kind == self.__LINE_END:
+                if tokenlist:
+                    yield line_number, tokenlist
+                    tokenlist = []
+                    append = tokenlist.append
+                line_number += 1
+                line_start = match.end()
+                continue
+
+            column = match.start(kind) - line_start
+            try:
+                lexeme = decode(match.group(kind))
+
+            except UnicodeDecodeError:
+                raise SyntaxError('Invalid UTF-8 in source line ' +
+                                  str(line_number) + ', column ' + str(column))
+
+            if kind == self.__NAME and decode is not str:
+                # A name may have run on into bytes the text pattern would
+                # not take, such as a non-ASCII symbol
+                name = self.__name_pattern.match(lexeme)
+                end = name.end() if name else 0
+                if end < len(lexeme):
+                    column += len(lexeme[:end].encode('utf-8'))
+                    raise SyntaxError('Syntax error in source line ' +
+                                      str(line_number) + ', column ' +
+                                      str(column))
+
+            if kind == self.__NAME:
+                lexeme = lexeme.upper()
+                append(Token(column, keywords.get(lexeme, Token.NAME), lexeme))
+
+            elif kind == self.__SMALL:
+                append(Token(column, smalltokens[lexeme], lexeme))
+
+            elif kind == self.__NUMBER:
+                if '.' in lexeme:
+                    append(Token(column, Token.UNSIGNEDFLOAT, lexeme))
                 else:
-                    token.category = Token.smalltokens[save]
-                    token.lexeme = save
-
-            elif c != '':
-                raise SyntaxError('Syntax error')
-            tokenlist.append(token)
+                    append(Token(column, Token.UNSIGNEDINT, lexeme))
 
-        return tokenlist
+            elif kind == self.__STRING:
+                append(Token(column - 1, Token.STRING, lexeme))
 
-    def __get_next_char(self):
-        if self.__column < len(self.__stmt):
-            next_char = self.__stmt[self.__column]
-            self.__column = self.__column + 1
+            elif kind == self.__QUOTE:
+                raise SyntaxError('Mismatched quotes in source line ' +
+                                  str(line_number) + ', column ' + str(column))
 
-            return next_char
+            else:
+                raise SyntaxError('Syntax error in source line ' +
+                                  str(line_number) + ', column ' + str(column))
 
-        else:
-            return ''
+    def __decode(self, lexeme):
+        return lexeme.decode('utf-8')
 
 
 if __name__ == "__main__":
     import doctest
-    doctest.testmod()
\ No newline at end of file
+    doctest.testmod()
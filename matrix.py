@@ -0,0 +1,136 @@
+from basictoken import BASICToken as Token
+from array import array
+from operator import add, sub, mul
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def mat(target, op, operands, scalar=None):
+    # Whole-array MAT assignment: ZER, CON, IDN, copy, A + B, A - B,
+    # A * B (matrix product) and (k) * A. Arrays are used as dimensioned,
+    # element 0 included.
+    for operand in [target] + operands:
+        if type(operand.data) == list:
+            raise TypeError('MAT requires numeric arrays, not ' + operand.name)
+
+    if op == Token.ZER:
+        target.data = array('q', bytes(8 * len(target.data)))
+
+    elif op == Token.CON:
+        target.data = array('q', [1]) * len(target.data)
+
+    elif op == Token.IDN:
+        if len(target.dims) != 2 or target.dims[0] != target.dims[1]:
+            raise IndexError('IDN requires a square array ' + target.name)
+        data = array('q', bytes(8 * len(target.data)))
+        for index in range(target.dims[0]):
+            data[index * target.dims[0] + index] = 1
+        target.data = data
+
+    elif op is None:
+        _same_shape(target, operands[0])
+        target.data = array(operands[0].data.typecode, operands[0].data)
+
+    elif op == Token.TIMES and scalar is not None:
+        source = operands[0]
+        _same_shape(target, source)
+        result = _numpy(lambda view: view * scalar, [source])
+        if result is not None:
+            _store(target, result)
+        else:
+            _replace(target, [value * scalar for value in source.data])
+
+    elif op in [Token.PLUS, Token.MINUS]:
+        left, right = operands
+        _same_shape(target, left)
+        _same_shape(target, right)
+        result = _numpy(add if op == Token.PLUS else sub, [left, right])
+        if result is not None:
+            _store(target, result)
+        else:
+            _replace(target, list(map(add if op == Token.PLUS else sub,
+                                      left.data, right.data)))
+
+    elif op == Token.TIMES:
+        _product(target, operands[0], operands[1])
+
+
+def _same_shape(target, source):
+    if target.dims != source.dims:
+        raise IndexError('Array ' + source.name + ' does not match the' +
+                         ' dimensions of ' + target.name)
+
+
+def _product(target, left, right):
+    if len(left.dims) != 2 or len(right.dims) not in [1, 2] or \
+       left.dims[1] != right.dims[0]:
+        raise IndexError('Arrays ' + left.name + ' and ' + right.name +
+                         ' cannot be multiplied')
+
+    rows, inner = left.dims
+    columns = right.dims[1] if len(right.dims) == 2 else 1
+    shape = [rows, columns] if len(right.dims) == 2 else [rows]
+    if target.dims != shape:
+        raise IndexError('Array ' + target.name + ' does not match the' +
+                         ' dimensions of the product')
+
+    result = _numpy(lambda left, right: left @ right, [left, right])
+    if result is not None:
+        _store(target, result)
+        return
+
+    right_columns = [right.data[column::columns] for column in range(columns)]
+    result = []
+    for row in range(rows):
+        left_row = left.data[row * inner:(row + 1) * inner]
+        for right_column in right_columns:
+            result.append(sum(map(mul, left_row, right_column)))
+    _replace(target, result)
+
+
+def _replace(target, values):
+    try:
+        target.data = array('q', values)
+
+    except (TypeError, OverflowError):
+        target.data = array('d', values)
+
+
+def _numpy(compute, sources):
+    # compute over NumPy views of sources, or None to take the pure Python
+    # path. NumPy integers wrap around where Python's widen to double, so
+    # an integer result is only used when working it out in float64 shows
+    # it is well within int64.
+    if numpy is None:
+        return None
+
+    views = [_view(source) for source in sources]
+    try:
+        result = compute(*views)
+        if result.dtype.kind in 'biu':
+            estimate = compute(*[view.astype(numpy.float64) for view in views])
+            if estimate.size and numpy.abs(estimate).max() >= 2.0 ** 62:
+                return None
+
+    except OverflowError:
+        return None
+
+    return result
+
+
+def _view(source):
+    dtype = numpy.int64 if source.data.typecode == 'q' else numpy.float64
+    return numpy.frombuffer(source.data, dtype=dtype).reshape(source.dims)
+
+
+def _store(target, result):
+    if result.dtype.kind in 'biu':
+        data = array('q')
+        data.frombytes(result.astype(numpy.int64).tobytes())
+    else:
+        data = array('d')
+        data.frombytes(result.astype(numpy.float64).tobytes())
+    target.data = data
@@ -0,0 +1,157 @@
+from basictoken import BASICToken as Token
+from basicnode import Const, Var, ArrayRef, Unary, Binary, Call, Assign, \
+    ArrayAssign, Dim, Mat, Print, If, For, Goto, Gosub, OnJump, Restore
+from evaluator import BASICEvaluator
+
+class Optimizer:
+
+    pure_functions = {Token.INT, Token.STR, Token.VAL, Token.LEN,
+                      Token.LEFT, Token.RIGHT, Token.TAB}
+
+    # Longer strings are not folded, but built when, and if, the line runs,
+    # where a Budget can limit them; folding happens as lines are entered
+    # and its results are kept in images and snapshots. The limit is the
+    # length of padding that TAB shares ready made.
+    max_string = 256
+
+    def optimize(self, stmts):
+        # Literal values assigned earlier on the same line are substituted
+        # into later expressions; any statement other than an assignment
+        # or PRINT may change variables or leave the line, so it forgets them
+        return self.__stmtlist(stmts, {})
+
+    def __stmtlist(self, stmts, literals):
+        return [self.__stmt(stmt, literals) for stmt in stmts]
+
+    def __stmt(self, stmt, literals):
+        stmt_type = type(stmt)
+
+        if stmt_type == Assign:
+            expr = self.__fold(stmt.expr, literals)
+            if type(expr) == Const:
+                literals[stmt.name] = expr
+            else:
+                literals.pop(stmt.name, None)
+            return Assign(stmt.name, expr)
+
+        elif stmt_type == ArrayAssign:
+            return ArrayAssign(stmt.name,
+                               [self.__fold(index, literals) for index in stmt.indices],
+                               self.__fold(stmt.expr, literals))
+
+        elif stmt_type == Print:
+            filenum = stmt.filenum
+            if filenum is not None:
+                filenum = self.__fold(filenum, literals)
+            return Print([(self.__fold(expr, literals), prntTab)
+                          for expr, prntTab in stmt.items],
+                         filenum, stmt.newline)
+
+        elif stmt_type == If:
+            cond = self.__fold(stmt.cond, literals)
+            folded = If(cond)
+            if stmt.then_target is not None:
+                folded.then_target = self.__fold(stmt.then_target, literals)
+            elif stmt.then_body is not None:
+                folded.then_body = self.__stmtlist(stmt.then_body, dict(literals))
+            if stmt.else_target is not None:
+                folded.else_target = self.__fold(stmt.else_target, literals)
+            elif stmt.else_body is not None:
+                folded.else_body = self.__stmtlist(stmt.else_body, dict(literals))
+            literals.clear()
+            return folded
+
+        elif stmt_type == For:
+            folded = For(stmt.var, self.__fold(stmt.start, literals),
+                         self.__fold(stmt.end, literals),
+                         None if stmt.step is None else self.__fold(stmt.step, literals))
+
+        elif stmt_type == Goto:
+            folded = Goto(self.__fold(stmt.target, literals))
+
+        elif stmt_type == Gosub:
+            folded = Gosub(self.__fold(stmt.target, literals))
+
+        elif stmt_type == OnJump:
+            folded = OnJump(self.__fold(stmt.expr, literals),
+                            [self.__fold(target, literals) for target in stmt.targets],
+                            stmt.gosub)
+
+        elif stmt_type == Dim:
+            folded = Dim([(name, [self.__fold(dim, literals) for dim in dims])
+                          for name, dims in stmt.arrays])
+
+        elif stmt_type == Mat and stmt.scalar is not None:
+            folded = Mat(stmt.name, stmt.op, stmt.operands,
+                         self.__fold(stmt.scalar, literals))
+
+        elif stmt_type == Restore and stmt.target is not None:
+            folded = Restore(self.__fold(stmt.target, literals))
+
+        else:
+            folded = stmt
+
+        literals.clear()
+        return folded
+
+    def __fold(self, expr, literals):
+        expr_type = type(expr)
+
+        if expr_type == Var:
+            return literals.get(expr.name, expr)
+
+        elif expr_type == ArrayRef:
+            return ArrayRef(expr.name,
+                            [self.__fold(index, literals) for index in expr.indices])
+
+        elif expr_type == Unary:
+            operand = self.__fold(expr.operand, literals)
+            if type(operand) == Const:
+                try:
+                    if expr.op == Token.MINUS:
+                        return Const(-operand.value)
+                    return Const(not operand.value)
+                except Exception:
+                    pass
+            return Unary(expr.op, operand)
+
+        elif expr_type == Binary:
+            left = self.__fold(expr.left, literals)
+            right = self.__fold(expr.right, literals)
+            if type(left) == Const and type(right) == Const and \
+               self.__short(expr.op, left.value, right.value):
+                try:
+                    value = BASICEvaluator.binary_ops[expr.op](left.value,
+                                                               right.value)
+                    if type(value) != str or len(value) <= self.max_string:
+                        return Const(value)
+                except Exception:
+                    # Errors such as division by zero are left to be
+                    # raised when, and if, the line runs
+                    pass
+            return Binary(expr.op, left, right)
+
+        elif expr_type == Call:
+            args = [self.__fold(arg, literals) for arg in expr.args]
+            if expr.func in self.pure_functions and \
+               all(type(arg) == Const for arg in args) and \
+               (expr.func != Token.TAB or self.__short(Token.TIMES, ' ', args[0].value)):
+                try:
+                    value = BASICEvaluator.functions[expr.func](
+                        *[arg.value for arg in args])
+                    if type(value) != str or len(value) <= self.max_string:
+                        return Const(value)
+                except Exception:
+                    pass
+            return Call(expr.func, args)
+
+        return expr
+
+    def __short(self, op, left, right):
+        # Whether a string repeated by op is short enough to build, judged
+        # before it is built
+        if op == Token.TIMES:
+            for text, count in [(left, right), (right, left)]:
+                if type(text) == str and type(count) in (int, float, bool):
+                    return len(text) * count <= self.max_string
+        return True
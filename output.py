@@ -0,0 +1,70 @@
+import sys
+
+class BASICOutput:
+
+    # Console output for PRINT. Text is gathered until buffer_size
+    # characters are pending, or until flush() at STOP and at the end of a
+    # run, and then written in one call. With no stream the text goes to
+    # whatever sys.stdout is at that moment; any other stream is taken to
+    # be binary and is sent the text encoded. A buffer_size of 0 writes
+    # every item as it is printed. By default that is done for a terminal
+    # on sys.stdout, which then buffers by line, so that an interactive
+    # session sees each line as it is printed; anything else gets 64 KiB.
+
+    def __init__(self, stream=None, buffer_size=None, encoding='utf-8'):
+        if buffer_size is None:
+            buffer_size = 0 if stream is None and _isatty(sys.stdout) else 65536
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.encoding = encoding
+        self.column = 0
+        self.__pending = []
+        self.__size = 0
+
+    def write(self, text):
+        self.__pending.append(text)
+        self.__size += len(text)
+        if self.__size >= self.buffer_size:
+            self.__drain()
+
+    def watch(self, callback):
+        # Until unwatch(), write on this instance first passes the text to
+        # callback; an unwatched output keeps the plain method
+        def watched(text):
+            callback(text)
+            BASICOutput.write(self, text)
+
+        self.write = watched
+
+    def unwatch(self):
+        self.__dict__.pop('write', None)
+
+    def flush(self):
+        # Streams without flush(), such as an asyncio StreamWriter, are
+        # left to be drained by whoever owns them
+        self.__drain()
+        if self.stream is None:
+            sys.stdout.flush()
+        elif hasattr(self.stream, 'flush'):
+            self.stream.flush()
+
+    def __drain(self):
+        if not self.__pending:
+            return
+
+        text = ''.join(self.__pending)
+        self.__pending.clear()
+        self.__size = 0
+        if self.stream is None:
+            sys.stdout.write(text)
+        else:
+            self.stream.write(text.encode(self.encoding))
+
+
+def _isatty(stream):
+    # sys.stdout may be replaced by an object without isatty(), or be None
+    try:
+        return stream.isatty()
+
+    except (AttributeError, ValueError):
+        return False
@@ -0,0 +1,114 @@
+from flowsignal import FlowSignal
+import json
+import marshal
+import sys
+import time
+
+class LineProfiler:
+
+    # Per line counts and wall times for one or more runs of a program on
+    # the tree engine. Self time is spent in the line's own statements;
+    # cumulative time adds the subroutines it calls with GOSUB, up to
+    # their RETURN, much as pstats treats function calls.
+
+    transition_names = {FlowSignal.SIMPLE_JUMP: 'jump', FlowSignal.GOSUB: 'gosub',
+                        FlowSignal.RETURN: 'return', FlowSignal.STOP: 'stop',
+                        FlowSignal.LOOP_BEGIN: 'loop begin',
+                        FlowSignal.LOOP_REPEAT: 'loop repeat',
+                        FlowSignal.LOOP_SKIP: 'loop skip'}
+
+    def __init__(self, timer=time.perf_counter):
+        self.timer = timer
+        self.counts = {}
+        self.self_times = {}
+        self.cumulative_times = {}
+        self.transitions = {}
+        self.__gosubs = []
+        self.__active = {}
+
+    def wrap(self, execute_line):
+        # Returns execute_line with every call measured; the program loop
+        # uses it in place of the plain one
+        timer = self.timer
+        counts = self.counts
+        self_times = self.self_times
+        cumulative_times = self.cumulative_times
+        gosubs = self.__gosubs
+        gosubs.clear()
+        # GOSUB frames still open per calling line; as with recursive
+        # functions in cProfile, time inside a line's own open frame is
+        # counted towards its cumulative time only once, by the outermost
+        active = self.__active
+        active.clear()
+
+        def profiled(line_number):
+            start = timer()
+            flowsignal = execute_line(line_number)
+            end = timer()
+            elapsed = end - start
+
+            counts[line_number] = counts.get(line_number, 0) + 1
+            self_times[line_number] = self_times.get(line_number, 0.0) + elapsed
+            cumulative_times.setdefault(line_number, 0.0)
+            if not active.get(line_number):
+                cumulative_times[line_number] += elapsed
+
+            if flowsignal:
+                self.__transition(line_number, flowsignal.ftype)
+                if flowsignal.ftype == FlowSignal.GOSUB:
+                    gosubs.append((line_number, end))
+                    active[line_number] = active.get(line_number, 0) + 1
+                elif flowsignal.ftype == FlowSignal.RETURN and gosubs:
+                    caller, called = gosubs.pop()
+                    active[caller] -= 1
+                    if not active[caller]:
+                        cumulative_times[caller] += end - called
+
+            return flowsignal
+
+        return profiled
+
+    def __transition(self, line_number, ftype):
+        name = self.transition_names.get(ftype, str(ftype))
+        transitions = self.transitions.setdefault(line_number, {})
+        transitions[name] = transitions.get(name, 0) + 1
+
+    def stats(self):
+        # One dict per line, hottest (by self time) first
+        return [{'line': line_number,
+                 'count': self.counts[line_number],
+                 'self': self.self_times[line_number],
+                 'cumulative': self.cumulative_times[line_number],
+                 'transitions': self.transitions.get(line_number, {})}
+                for line_number in sorted(self.counts,
+                                          key=lambda line_number: (-self.self_times[line_number],
+                                                                   line_number))]
+
+    def report(self, stream=None, limit=20, describe=None):
+        # describe, if given, maps a line number to its source text
+        stream = stream if stream is not None else sys.stderr
+        total = sum(self.self_times.values())
+
+        stream.write('%8s %10s %10s %10s %6s  %s\n' %
+                     ('line', 'count', 'self s', 'cumul s', 'self%', 'statement'))
+        for entry in self.stats()[:limit]:
+            text = describe(entry['line']).strip() if describe else ''
+            stream.write('%8d %10d %10.6f %10.6f %6.1f  %s\n' %
+                         (entry['line'], entry['count'], entry['self'],
+                          entry['cumulative'],
+                          100.0 * entry['self'] / total if total else 0.0, text))
+
+    def dump_json(self, path):
+        with open(path, 'w') as stats_file:
+            json.dump({'lines': self.stats()}, stats_file, indent=1)
+
+    def dump_stats(self, path, filename='<basic>'):
+        # Written in the format pstats.Stats loads, with each BASIC line
+        # standing in for a function
+        stats = {}
+        for entry in self.stats():
+            key = (filename, entry['line'], 'line ' + str(entry['line']))
+            stats[key] = (entry['count'], entry['count'], entry['self'],
+                          entry['cumulative'], {})
+        with open(path, 'wb') as stats_file:
+            marshal.dump(stats, stats_file)
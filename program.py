@@ -1,43 +1,58 @@
 from basictoken import BASICToken as Token
+from basicnode import Next
 from basicparser import BASICParser
+from evaluator import BASICEvaluator
 from flowsignal import FlowSignal
 from lexer import Lexer
+from optimizer import Optimizer
+from resolver import Resolver
+from vm import BytecodeCompiler, BASICVM
+from sortedlines import SortedLines
+import asyncio
+from hooks import Hooks
+from callcache import CallCache
+import snapshot
+from itertools import starmap
 
 
 class BASICData:
     def __init__(self):
         self.__datastmts = {}
-        self.__next_data = 0
+        self.__datalines = SortedLines()
+        self.__decoded = {}
+        self.__values = []
+        self.__offsets = []
+        self.__stale = False
 
     def delete(self):
         self.__datastmts.clear()
-        self.__next_data = 0
+        self.__datalines.clear()
+        self.__decoded.clear()
+        self.__stale = True
 
     def delData(self,line_number):
         if self.__datastmts.get(line_number) != None:
             del self.__datastmts[line_number]
+            del self.__decoded[line_number]
+            self.__datalines.remove(line_number)
+            self.__stale = True
 
-    def addData(self,line_number,tokenlist):
+    def addData(self,line_number,tokenlist,data_values=None):
         self.__datastmts[line_number] = tokenlist
+        if data_values is None:
+            data_values = self.__decode(tokenlist)
+        self.__decoded[line_number] = data_values
+        self.__datalines.add(line_number)
+        self.__stale = True
 
     def getTokens(self,line_number):
         return self.__datastmts.get(line_number)
 
-    def readData(self,read_line_number):
-        if len(self.__datastmts) == 0:
-            raise RuntimeError('No DATA statements available to READ ' +
-                               'in line ' + str(read_line_number))
+    def getValues(self,line_number):
+        return self.__decoded.get(line_number)
+
+    def __decode(self, tokenlist):
         data_values = []
-        line_numbers = list(self.__datastmts.keys())
-        line_numbers.sort()
-        if self.__next_data == 0:
-            self.__next_data = line_numbers[0]
-        elif line_numbers.index(self.__next_data) < len(line_numbers)-1:
-            self.__next_data = line_numbers[line_numbers.index(self.__next_data)+1]
-        else:
-            raise RuntimeError('No DATA statements available to READ ' +
-                               'in line ' + str(read_line_number))
-        tokenlist = self.__datastmts[self.__next_data]
         sign = 1
         for token in tokenlist[1:]:
             if token.category != Token.COMMA:
@@ -46,56 +61,110 @@ class BASICData:
                 elif token.category == Token.UNSIGNEDINT:
                     data_values.append(sign*int(token.lexeme))
                 elif token.category == Token.UNSIGNEDFLOAT:
-                    data_values.append(sign*eval(token.lexeme))
+                    data_values.append(sign*float(token.lexeme))
                 elif token.category == Token.MINUS:
                     sign = -1
             else:
                 sign = 1
         return data_values
 
+    def __flatten(self):
+        # All DATA values are laid out in line order once per edit, with
+        # the offset of each line's first value kept for RESTORE
+        self.__values = []
+        self.__offsets = []
+        for line_number in self.__datalines:
+            self.__offsets.append(len(self.__values))
+            self.__values.extend(self.__decoded[line_number])
+        self.__stale = False
+
+    def values(self):
+        if self.__stale:
+            self.__flatten()
+        return self.__values
+
+    def offset(self,restoreLineNo):
+        # Where READ carries on from after RESTORE restoreLineNo
+        if self.__stale:
+            self.__flatten()
+
+        if restoreLineNo == 0:
+            return 0
+
+        indexln = self.__datalines.bisect(restoreLineNo)
+        if indexln < len(self.__offsets):
+            return self.__offsets[indexln]
+        return len(self.__values)
+
+
+class DataReader:
+
+    # One run's position in the program's DATA, so that concurrent runs
+    # READ independently; position is the index of the next value
+
+    def __init__(self, basicdata):
+        self.__data = basicdata
+        self.position = 0
+
+    def readData(self,read_line_number):
+        values = self.__data.values()
+        if self.position >= len(values):
+            raise RuntimeError('No DATA statements available to READ ' +
+                               'in line ' + str(read_line_number))
+
+        value = values[self.position]
+        self.position += 1
+        return value
+
     def restore(self,restoreLineNo):
-        if restoreLineNo == 0 or restoreLineNo in self.__datastmts:
+        self.position = self.__data.offset(restoreLineNo)
 
-            if restoreLineNo == 0:
-                self.__next_data = restoreLineNo
-            else:
 
-                line_numbers = list(self.__datastmts.keys())
-                line_numbers.sort()
+class TreeRun:
 
-                indexln = line_numbers.index(restoreLineNo)
+    # Where one run of the tree engine is: the position of the line to
+    # run next (kept up to date only where the loop yields), GOSUB return
+    # lines, where the body of each active loop starts, as a line position
+    # and statement index, and the statement to resume from when the line
+    # to run next is to be started part way along
+
+    __slots__ = ('index', 'return_stack', 'return_loop', 'resume')
+
+    def __init__(self):
+        self.index = 0
+        self.return_stack = []
+        self.return_loop = {}
+        self.resume = 0
 
-                if indexln == 0:
-                    self.__next_data = 0
-                else:
-                    self.__next_data = line_numbers[indexln-1]
 
 class Program:
 
-    def __init__(self):
+    def __init__(self, optimize=True):
         self.__program = {}
-        self.__next_stmt = 0
-        self.__return_stack = []
-        self.__return_loop = {}
+        self.__compiled = {}
+        self.__line_code = {}
+        self.__bytecode = None
+        self.__parser = BASICParser()
+        self.__optimizer = Optimizer() if optimize else None
+        self.__resolver = Resolver()
+        self.__lines = SortedLines()
+        self.__next_lines = {}
         self.__data = BASICData()
+        self.hooks = Hooks()
+        # Off until given a size: it only pays for programs that call
+        # the same functions with the same few arguments over and over
+        self.call_cache = CallCache(0)
+        self.__restored = None
 
     def __str__(self):
 
-        program_text = ""
-        line_numbers = self.line_numbers()
-
-        for line_number in line_numbers:
-            program_text += self.str_statement(line_number)
-
-        return program_text
+        return "".join([self.str_statement(line_number)
+                        for line_number in self.__lines])
 
     def str_statement(self, line_number):
         line_text = str(line_number) + " "
 
-        statement = self.__program[line_number]
-        if statement[0].category == Token.DATA:
-            statement = self.__data.getTokens(line_number)
-        for token in statement:
+        for token in self.__statement(line_number):
             if token.category == Token.STRING:
                 line_text += '"' + token.lexeme + '" '
 
@@ -104,134 +173,455 @@ class Program:
         line_text += "\n"
         return line_text
 
+    def __statement(self, line_number):
+        # Lines loaded from an image keep their tokens as tuples until
+        # they are first listed
+        statement = self.__program[line_number]
+        if type(statement[0]) == tuple:
+            statement = self.__program[line_number] = list(starmap(Token, statement))
+        if statement[0].category == Token.DATA:
+            statement = self.__data.getTokens(line_number)
+        return statement
+
     def list(self, start_line=None, end_line=None):
-        line_numbers = self.line_numbers()
-        if not start_line:
-            start_line = int(line_numbers[0])
+        for line_number in self.__lines.range(start_line or None,
+                                              end_line or None):
+            print(self.str_statement(line_number), end="")
 
-        if not end_line:
-            end_line = int(line_numbers[-1])
+    def add_stmt(self, tokenlist):
+        self.__index_lines([self.__add_stmt(tokenlist)])
 
-        for line_number in line_numbers:
-            if int(line_number) >= start_line and int(line_number) <= end_line:
-                print(self.str_statement(line_number), end="")
+    def add_stmts(self, tokenlists):
+        self.__index_lines([self.__add_stmt(tokenlist)
+                            for tokenlist in tokenlists])
 
-    def add_stmt(self, tokenlist):
+    def __add_stmt(self, tokenlist):
         try:
             line_number = int(tokenlist[0].lexeme)
             if tokenlist[1].lexeme == "DATA":
-                self.__data.addData(line_number,tokenlist[1:])
-                self.__program[line_number] = [tokenlist[1],]
+                statement = [tokenlist[1],]
             else:
-                self.__program[line_number] = tokenlist[1:]
+                statement = tokenlist[1:]
+
+            compiled = self.__parser.parse(statement, line_number)
+            if self.__optimizer:
+                compiled = self.__optimizer.optimize(compiled)
+            self.__resolver.resolve(compiled)
+            if line_number in self.__lines:
+                self.__unindex_next(line_number)
+            self.__data.delData(line_number)
+
+            self.__compiled[line_number] = compiled
+            if tokenlist[1].lexeme == "DATA":
+                self.__data.addData(line_number,tokenlist[1:])
+            self.__program[line_number] = statement
+            self.__line_code.pop(line_number, None)
+            self.__bytecode = None
+
+            return line_number
 
         except TypeError as err:
             raise TypeError("Invalid line number: " +
                             str(err))
 
     def line_numbers(self):
-        line_numbers = list(self.__program.keys())
-        line_numbers.sort()
+        return list(self.__lines)
+
+    def image(self):
+        # Everything needed to run the program without lexing or parsing
+        # it again: tokens (kept for listing), compiled trees, the slots
+        # they were resolved against, decoded DATA values and the bytecode
+        tokens = {}
+        data_values = {}
+        for line_number in self.__lines:
+            tokens[line_number] = [(token.column, token.category, token.lexeme)
+                                   for token in self.__statement(line_number)]
+            values = self.__data.getValues(line_number)
+            if values is not None:
+                data_values[line_number] = values
+
+        return {'optimize': self.__optimizer is not None,
+                'tokens': tokens,
+                'compiled': self.__compiled,
+                'resolver': self.__resolver,
+                'data': data_values,
+                'bytecode': self.__compile_bytecode()}
+
+    def load_image(self, image):
+        self.delete()
+        self.__optimizer = Optimizer() if image['optimize'] else None
+        self.__resolver = image['resolver']
+
+        for line_number, tokens in image['tokens'].items():
+            if line_number in image['data']:
+                tokenlist = list(starmap(Token, tokens))
+                self.__data.addData(line_number, tokenlist,
+                                    image['data'][line_number])
+                tokens = tokenlist[:1]
+            self.__program[line_number] = tokens
+            self.__compiled[line_number] = image['compiled'][line_number]
+
+        self.__index_lines(list(self.__program))
+        self.__bytecode = image['bytecode']
+
+    def __index_lines(self, line_numbers):
+        # Keeps the line number -> position index and the per-variable lines
+        # starting with NEXT, used to find the end of a loop, in step with
+        # edits; a line replaced keeps its place in the line index
+        if len(line_numbers) == 1:
+            self.__lines.add(line_numbers[0])
+        else:
+            self.__lines.update(line_numbers)
 
-        return line_numbers
+        next_lines = {}
+        for line_number in line_numbers:
+            for loop_variable in self.__next_vars(self.__compiled[line_number]):
+                next_lines.setdefault(loop_variable, []).append(line_number)
+
+        for loop_variable in next_lines:
+            self.__next_lines.setdefault(loop_variable, SortedLines()).update(
+                next_lines[loop_variable])
+
+    def __unindex_line(self, line_number):
+        self.__lines.remove(line_number)
+        self.__unindex_next(line_number)
+
+    def __unindex_next(self, line_number):
+        for loop_variable in self.__next_vars(self.__compiled[line_number]):
+            self.__next_lines[loop_variable].remove(line_number)
+
+    def __next_vars(self, stmts):
+        # The loop variables of the NEXT statements a line starts with
+        loop_variables = []
+        for stmt in stmts:
+            if type(stmt) != Next:
+                break
+            if stmt.var not in loop_variables:
+                loop_variables.append(stmt.var)
+        return loop_variables
+
+    def __line_position(self, line_number):
+        try:
+            return self.__lines.position(line_number)
 
-    def __execute(self, line_number):
-        if line_number not in self.__program.keys():
-            raise RuntimeError("Line number " + line_number +
+        except KeyError:
+            raise RuntimeError("Line number " + str(line_number) +
                                " does not exist")
 
-        statement = self.__program[line_number]
-
+    def __statement_after(self, stmts, stmt):
+        # The index after stmt among a line's statements, or the end of the
+        # line if stmt is inside an IF branch, which always ends its line
+        for stmt_index, line_stmt in enumerate(stmts):
+            if line_stmt is stmt:
+                return stmt_index + 1
+        return len(stmts)
+
+    def __loop_end(self, line_number, for_stmt):
+        # The position of the line with the NEXT for the loop entered by
+        # for_stmt on line_number, and the index of the statement after the
+        # NEXT. That is the first such NEXT later on the FOR's own line, or
+        # else the first after line_number in a line starting with one.
+        loop_variable = for_stmt.var
+        stmts = self.__compiled[line_number]
+        for stmt_index in range(self.__statement_after(stmts, for_stmt), len(stmts)):
+            stmt = stmts[stmt_index]
+            if type(stmt) == Next and stmt.var == loop_variable:
+                return self.__lines.position(line_number), stmt_index + 1
+
+        if loop_variable in self.__next_lines:
+            next_line = self.__next_lines[loop_variable].after(line_number)
+            if next_line is not None:
+                stmts = self.__compiled[next_line]
+                for stmt_index, stmt in enumerate(stmts):
+                    if type(stmt) == Next and stmt.var == loop_variable:
+                        return self.__lines.position(next_line), stmt_index + 1
+        return None
+
+    def __line_executor(self, evaluator, run):
+        # Runs one line for one run of the program; run.resume, when set,
+        # is the statement of the line to start from
+        compiled = self.__compiled
+
+        def execute_line(line_number):
+            if line_number not in compiled:
+                raise RuntimeError("Line number " + str(line_number) +
+                                   " does not exist")
+
+            statement = compiled[line_number]
+            if run.resume:
+                statement = statement[run.resume:]
+                run.resume = 0
+
+            return evaluator.execute(statement, line_number)
+
+        return execute_line
+
+    def __compile_bytecode(self, trace=False):
+        # Only lines edited since the last compile are compiled again;
+        # the rest of the program is just linked
+        if len(self.__lines) == 0:
+            return None
+        if self.__bytecode is not None and not trace:
+            return self.__bytecode
+
+        compiler = BytecodeCompiler()
+        lines = []
+        for line_number in self.__lines:
+            line_code = self.__line_code.get(line_number)
+            if line_code is None:
+                line_code = compiler.compile_line(line_number,
+                                                  self.__compiled[line_number])
+                self.__line_code[line_number] = line_code
+            lines.append((line_number, line_code))
+
+        bytecode = compiler.link(lines, trace)
+        if not trace:
+            self.__bytecode = bytecode
+        return bytecode
+
+    def __evaluator(self, engine, output, channels, profiler):
+        if engine not in ["tree", "vm"]:
+            raise ValueError("Unknown execution engine: " + str(engine))
+        if profiler is not None and engine != "tree":
+            raise ValueError("Profiling is only supported by the tree engine")
+        if Hooks.FLOW in self.hooks and engine != "tree":
+            raise ValueError("Flow hooks are only supported by the tree engine")
+
+        # Everything a run changes lives in its evaluator: variables,
+        # arrays, the DATA position, open files and the output
+        evaluator = BASICEvaluator(DataReader(self.__data), self.__resolver,
+                                   output, channels,
+                                   self.hooks.dispatcher(Hooks.WRITE),
+                                   self.call_cache)
+        on_output = self.hooks.dispatcher(Hooks.OUTPUT)
+        if on_output is not None:
+            evaluator.output.watch(on_output)
+        return evaluator
+
+    def __finish(self, evaluator):
+        evaluator.close()
+        evaluator.output.unwatch()
+
+    def execute(self, engine="tree", output=None, channels=None, profiler=None,
+                budget=None, checkpoint=None, checkpoint_every=10000):
+        # With checkpoint given, it is called with a snapshot of the run
+        # every checkpoint_every lines
+        evaluator = self.__evaluator(engine, output, channels, profiler)
         try:
-            return self.__parser.parse(statement, line_number)
-
-        except RuntimeError as err:
-            raise RuntimeError(str(err))
-
-    def execute(self):
-        self.__parser = BASICParser(self.__data)
-        self.__data.restore(0)
-        line_numbers = self.line_numbers()
-        if len(line_numbers) > 0:
-            index = 0
-            self.set_next_line_number(line_numbers[index])
-            while True:
-                flowsignal = self.__execute(self.get_next_line_number())
-                self.__parser.last_flowsignal = flowsignal
-
-                if flowsignal:
-                    if flowsignal.ftype == FlowSignal.SIMPLE_JUMP:
-                        index = line_numbers.index(flowsignal.ftarget)
-                        self.set_next_line_number(flowsignal.ftarget)
-
-                    elif flowsignal.ftype == FlowSignal.GOSUB:
-                        if index + 1 < len(line_numbers):
-                            self.__return_stack.append(line_numbers[index + 1])
-
-                        else:
-                            raise RuntimeError("GOSUB at end of program, nowhere to return")
-                        
-                        index = line_numbers.index(flowsignal.ftarget)
-
-                        self.set_next_line_number(flowsignal.ftarget)
-
-                    elif flowsignal.ftype == FlowSignal.RETURN:
-                        index = line_numbers.index(self.__return_stack.pop())
-                        self.set_next_line_number(line_numbers[index])
-
-                    elif flowsignal.ftype == FlowSignal.STOP:
-                        break
+            if len(self.__lines) == 0:
+                raise RuntimeError("No statements to execute")
+            run = self.__start(engine, evaluator, checkpoint)
+
+            if engine == "vm":
+                self.__vm_run(evaluator, budget)
+            elif checkpoint is not None:
+                for _ in self.__tree_run(evaluator, profiler, budget,
+                                         checkpoint_every, run):
+                    checkpoint(self.__snapshot(evaluator, run))
+            else:
+                for _ in self.__tree_run(evaluator, profiler, budget, None, run):
+                    pass
+
+        finally:
+            self.__finish(evaluator)
+
+    async def execute_async(self, output=None, channels=None, profiler=None,
+                            budget=None, slice_lines=1000, checkpoint=None,
+                            checkpoint_every=10000):
+        # Runs on the tree engine as a coroutine, giving way to the event
+        # loop every slice_lines lines. Pending PRINT output is written out
+        # at each of those points, and if the output's stream has an
+        # asyncio drain() it is awaited, so a slow reader holds back only
+        # its own session. Any number of runs, of this program or others,
+        # can share one event loop.
+        evaluator = self.__evaluator("tree", output, channels, profiler)
+        stream = evaluator.output.stream
+        drain = getattr(stream, 'drain', None)
+        try:
+            if len(self.__lines) == 0:
+                raise RuntimeError("No statements to execute")
+            run = self.__start("tree", evaluator, checkpoint)
+
+            lines = 0
+            for _ in self.__tree_run(evaluator, profiler, budget, slice_lines, run):
+                lines += slice_lines
+                if checkpoint is not None and lines >= checkpoint_every:
+                    lines = 0
+                    checkpoint(self.__snapshot(evaluator, run))
+                evaluator.output.flush()
+                if drain is not None:
+                    await drain()
+                else:
+                    await asyncio.sleep(0)
+
+        finally:
+            self.__finish(evaluator)
+
+    def __start(self, engine, evaluator, checkpoint):
+        # The state a tree engine run starts in: where a restored snapshot
+        # left off, the first time the program runs after restoring it,
+        # or else the start of the program
+        if engine != "tree" and (checkpoint is not None or
+                                 self.__restored is not None):
+            raise ValueError("Snapshots are only supported by the tree engine")
+
+        run = TreeRun()
+        state, self.__restored = self.__restored, None
+        if state is not None:
+            evaluator.restore(state['evaluator'])
+            run.index = state['index']
+            run.resume = state['resume']
+            run.return_stack.extend(state['return_stack'])
+            run.return_loop.update(state['return_loop'])
+        return run
+
+    def __snapshot(self, evaluator, run):
+        image = self.image()
+        image['bytecode'] = None
+        return snapshot.dumps({'image': image,
+                               'index': run.index,
+                               'resume': run.resume,
+                               'return_stack': list(run.return_stack),
+                               'return_loop': dict(run.return_loop),
+                               'evaluator': evaluator.state()})
+
+    @staticmethod
+    def restore_snapshot(data):
+        # Returns the program a snapshot was taken from, set to carry on
+        # from that point the next time it is executed, in this process
+        # or any other. Open files are reopened by absolute path.
+        state = snapshot.loads(data)
+        program = Program(state['image']['optimize'])
+        program.load_image(state['image'])
+        program.__restored = state
+        return program
+
+    def __vm_run(self, evaluator, budget=None):
+        on_line = self.hooks.dispatcher(Hooks.LINE)
+        return_stack = []
+        if budget is not None:
+            meter = budget.meter(evaluator, return_stack)
+            if on_line is None:
+                on_line = meter
+            else:
+                on_hook = on_line
+
+                def on_line(line_number):
+                    meter(line_number)
+                    on_hook(line_number)
 
-                    elif flowsignal.ftype == FlowSignal.LOOP_BEGIN:
-                        self.__return_loop[flowsignal.floop_var] = line_numbers[index]
+        if on_line is not None:
+            # Line callbacks need code with a LINE instruction at the
+            # start of every line, which the cached bytecode leaves out
+            BASICVM(self.__compile_bytecode(trace=True), evaluator, on_line,
+                    return_stack).run()
+        else:
+            BASICVM(self.__compile_bytecode(), evaluator).run()
+
+    def __tree_run(self, evaluator, profiler=None, budget=None, slice_lines=None,
+                   run=None):
+        # The tree engine's line loop, as a generator that yields after
+        # every slice_lines lines, or never if slice_lines is None
+        if run is None:
+            run = TreeRun()
+        execute_line = self.__line_executor(evaluator, run)
+        if Hooks.LINE in self.hooks or Hooks.FLOW in self.hooks:
+            execute_line = self.hooks.wrap(execute_line)
+        if profiler is not None:
+            execute_line = profiler.wrap(execute_line)
+        if budget is not None:
+            execute_line = budget.meter(evaluator, run.return_stack).wrap(execute_line)
+
+        line_numbers = self.__lines
+        return_stack = run.return_stack
+        return_loop = run.return_loop
+        countdown = slice_lines
+
+        index = run.index
+        while True:
+            if slice_lines:
+                countdown -= 1
+                if countdown == 0:
+                    countdown = slice_lines
+                    run.index = index
+                    yield
+
+            flowsignal = execute_line(line_numbers[index])
+
+            if flowsignal:
+                if flowsignal.ftype == FlowSignal.SIMPLE_JUMP:
+                    index = self.__line_position(flowsignal.ftarget)
+
+                elif flowsignal.ftype == FlowSignal.GOSUB:
+                    if index + 1 < len(line_numbers):
+                        return_stack.append(line_numbers[index + 1])
+
+                    else:
+                        raise RuntimeError("GOSUB at end of program, nowhere to return")
+
+                    index = self.__line_position(flowsignal.ftarget)
+
+                elif flowsignal.ftype == FlowSignal.RETURN:
+                    index = self.__lines.position(return_stack.pop())
+
+                elif flowsignal.ftype == FlowSignal.STOP:
+                    break
+
+                elif flowsignal.ftype == FlowSignal.LOOP_BEGIN:
+                    # The body starts with the statement after the FOR,
+                    # which may be on the same line
+                    stmts = self.__compiled[line_numbers[index]]
+                    run.resume = self.__statement_after(stmts, flowsignal.floop_stmt)
+                    if run.resume == len(stmts):
+                        run.resume = 0
                         index = index + 1
+                    return_loop[flowsignal.floop_var] = (index, run.resume)
+
+                    if index >= len(line_numbers):
+                        break
 
-                        if index < len(line_numbers):
-                            self.set_next_line_number(line_numbers[index])
+                elif flowsignal.ftype == FlowSignal.LOOP_SKIP:
+                    # Carries on after the loop's NEXT, which may be
+                    # part way along its line
+                    loop_end = self.__loop_end(line_numbers[index], flowsignal.floop_stmt)
+                    if loop_end is None:
+                        break
 
-                    elif flowsignal.ftype == FlowSignal.LOOP_SKIP:
+                    index, run.resume = loop_end
+                    if run.resume == len(self.__compiled[line_numbers[index]]):
+                        run.resume = 0
                         index = index + 1
-                        while index < len(line_numbers):
-                            next_line_number = line_numbers[index]
-                            temp_tokenlist = self.__program[next_line_number]
-
-                            if temp_tokenlist[0].category == Token.NEXT and \
-                               len(temp_tokenlist) > 1:
-                                if temp_tokenlist[1].lexeme == flowsignal.ftarget:
-                                    index = index + 1
-                                    if index < len(line_numbers):
-                                        next_line_number = line_numbers[index]
-                                        self.set_next_line_number(next_line_number)
-                                        break
-
-                            index = index + 1
                         if index >= len(line_numbers):
                             break
 
-                    elif flowsignal.ftype == FlowSignal.LOOP_REPEAT:
-                        index = line_numbers.index(self.__return_loop.pop(flowsignal.floop_var))
-                        self.set_next_line_number(line_numbers[index])
-
-                else:
-                    index = index + 1
-                    if index < len(line_numbers):
-                        self.set_next_line_number(line_numbers[index])
-                    else:
+                elif flowsignal.ftype == FlowSignal.LOOP_REPEAT:
+                    # Straight back to the start of the loop body
+                    index, run.resume = return_loop[flowsignal.floop_var]
+                    if index >= len(line_numbers):
                         break
 
-        else:
-            raise RuntimeError("No statements to execute")
+            else:
+                index = index + 1
+                if index >= len(line_numbers):
+                    break
 
     def delete(self):
         self.__program.clear()
+        self.__compiled.clear()
+        self.__line_code.clear()
+        self.__bytecode = None
+        self.__lines.clear()
+        self.__next_lines.clear()
         self.__data.delete()
 
     def delete_statement(self, line_number):
+        # As in classic BASIC, deleting a line that is not there does nothing
+        if line_number not in self.__lines:
+            return
+
         self.__data.delData(line_number)
+        self.__unindex_line(line_number)
         del self.__program[line_number]
-
-    def get_next_line_number(self):
-        return self.__next_stmt
-
-    def set_next_line_number(self, line_number):
-        self.__next_stmt = line_number
\ No newline at end of file
+        del self.__compiled[line_number]
+        self.__line_code.pop(line_number, None)
+        self.__bytecode = None
\ No newline at end of file
@@ -0,0 +1,125 @@
+from basicnode import Var, ArrayRef, Unary, Binary, Call, Assign, \
+    ArrayAssign, Dim, Mat, Print, If, For, Next, Goto, Gosub, OnJump, Read, Restore, \
+    Open, Close, Input
+
+class Resolver:
+
+    def __init__(self):
+        self.__slots = {}
+        self.names = []
+        self.__array_slots = {}
+        self.array_names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def slot(self, name):
+        # Slots are handed out once per name and never reused, so trees
+        # compiled before an edit stay valid
+        if name not in self.__slots:
+            self.__slots[name] = len(self.names)
+            self.names.append(name)
+        return self.__slots[name]
+
+    def array_slot(self, name):
+        # Arrays live apart from scalars, so A and A() are different names
+        if name not in self.__array_slots:
+            self.__array_slots[name] = len(self.array_names)
+            self.array_names.append(name)
+        return self.__array_slots[name]
+
+    def resolve(self, stmts):
+        for stmt in stmts:
+            self.__stmt(stmt)
+        return stmts
+
+    def __stmt(self, stmt):
+        stmt_type = type(stmt)
+
+        if stmt_type == Assign:
+            stmt.slot = self.slot(stmt.name)
+            self.__expr(stmt.expr)
+
+        elif stmt_type == ArrayAssign:
+            stmt.slot = self.array_slot(stmt.name)
+            for index in stmt.indices:
+                self.__expr(index)
+            self.__expr(stmt.expr)
+
+        elif stmt_type == Dim:
+            stmt.slots = [self.array_slot(name) for name, dims in stmt.arrays]
+            for name, dims in stmt.arrays:
+                for dim in dims:
+                    self.__expr(dim)
+
+        elif stmt_type == Mat:
+            stmt.slot = self.array_slot(stmt.name)
+            stmt.slots = [self.array_slot(name) for name in stmt.operands]
+            self.__expr(stmt.scalar)
+
+        elif stmt_type == Print:
+            self.__expr(stmt.filenum)
+            for expr, prntTab in stmt.items:
+                self.__expr(expr)
+
+        elif stmt_type == If:
+            self.__expr(stmt.cond)
+            self.__expr(stmt.then_target)
+            self.__expr(stmt.else_target)
+            self.resolve(stmt.then_body or [])
+            self.resolve(stmt.else_body or [])
+
+        elif stmt_type == For:
+            stmt.slot = self.slot(stmt.var)
+            self.__expr(stmt.start)
+            self.__expr(stmt.end)
+            self.__expr(stmt.step)
+
+        elif stmt_type == Next:
+            stmt.slot = self.slot(stmt.var)
+
+        elif stmt_type in [Goto, Gosub, Restore]:
+            self.__expr(stmt.target)
+
+        elif stmt_type == OnJump:
+            self.__expr(stmt.expr)
+            for target in stmt.targets:
+                self.__expr(target)
+
+        elif stmt_type == Read:
+            stmt.slots = [self.slot(name) for name in stmt.names]
+
+        elif stmt_type == Open:
+            self.__expr(stmt.path)
+            self.__expr(stmt.filenum)
+            self.__expr(stmt.buffer_size)
+
+        elif stmt_type == Close:
+            for filenum in stmt.filenums:
+                self.__expr(filenum)
+
+        elif stmt_type == Input:
+            self.__expr(stmt.filenum)
+            stmt.slots = [self.slot(name) for name in stmt.names]
+
+    def __expr(self, expr):
+        expr_type = type(expr)
+
+        if expr_type == Var:
+            expr.slot = self.slot(expr.name)
+
+        elif expr_type == ArrayRef:
+            expr.slot = self.array_slot(expr.name)
+            for index in expr.indices:
+                self.__expr(index)
+
+        elif expr_type == Unary:
+            self.__expr(expr.operand)
+
+        elif expr_type == Binary:
+            self.__expr(expr.left)
+            self.__expr(expr.right)
+
+        elif expr_type == Call:
+            for arg in expr.args:
+                self.__expr(arg)
@@ -0,0 +1,53 @@
+import imagecache
+import marshal
+import zlib
+
+# A snapshot is the magic number, a format version, the tag of the
+# interpreter that took it, then the compressed marshal of the program
+# image, in the image cache's format, and of the run's state. The state
+# is plain data only, so like a cache file a snapshot cannot run code.
+MAGIC = b'BASS'
+VERSION = 2
+
+_plain = {type(None), bool, int, float, str, bytes}
+
+
+def header():
+    return MAGIC + bytes([VERSION]) + imagecache.interpreter_tag()
+
+
+def dumps(state):
+    state = dict(state)
+    state['image'] = imagecache.dumps(state['image'])
+    return header() + zlib.compress(marshal.dumps(state))
+
+
+def loads(data):
+    expected = header()
+    if data[:len(expected)] != expected:
+        raise ValueError('Not a snapshot of this interpreter version')
+
+    try:
+        state = marshal.loads(zlib.decompress(data[len(expected):]))
+        _check(state)
+        state['image'] = imagecache.loads(state['image'])
+
+    except (zlib.error, EOFError, ValueError, KeyError, TypeError,
+            AttributeError) as err:
+        raise ValueError('Corrupt snapshot: ' + str(err))
+
+    return state
+
+
+def _check(value):
+    # marshal can also build code objects, which a snapshot never holds
+    value_type = type(value)
+    if value_type in (list, tuple):
+        for item in value:
+            _check(item)
+    elif value_type == dict:
+        for key, item in value.items():
+            _check(key)
+            _check(item)
+    elif value_type not in _plain:
+        raise TypeError('Cannot restore ' + value_type.__name__)
@@ -0,0 +1,68 @@
+from bisect import bisect_left, bisect_right
+
+class SortedLines:
+
+    def __init__(self):
+        self.__lines = []
+        self.__positions = {}
+
+    def __len__(self):
+        return len(self.__lines)
+
+    def __iter__(self):
+        return iter(self.__lines)
+
+    def __contains__(self, line_number):
+        return line_number in self.__positions
+
+    def __getitem__(self, index):
+        return self.__lines[index]
+
+    def add(self, line_number):
+        if line_number in self.__positions:
+            return
+
+        position = bisect_left(self.__lines, line_number)
+        self.__lines.insert(position, line_number)
+        self.__positions[line_number] = position
+
+    def update(self, line_numbers):
+        # A whole batch of lines costs one sort
+        self.__lines = sorted(set(self.__lines).union(line_numbers))
+        self.__positions = dict(zip(self.__lines, range(len(self.__lines))))
+
+    def remove(self, line_number):
+        position = self.position(line_number)
+        del self.__lines[position]
+        del self.__positions[line_number]
+
+    def clear(self):
+        self.__lines = []
+        self.__positions.clear()
+
+    def position(self, line_number):
+        # Positions are recorded when lines are added and left alone when
+        # lines are inserted or removed before them, so an edit costs no
+        # more than the list insert; a recorded position that has gone
+        # stale is found again by bisection the next time it is asked for
+        position = self.__positions[line_number]
+        lines = self.__lines
+        if position >= len(lines) or lines[position] != line_number:
+            position = bisect_left(lines, line_number)
+            self.__positions[line_number] = position
+        return position
+
+    def bisect(self, line_number):
+        return bisect_left(self.__lines, line_number)
+
+    def after(self, line_number):
+        position = bisect_right(self.__lines, line_number)
+        if position < len(self.__lines):
+            return self.__lines[position]
+        return None
+
+    def range(self, start_line=None, end_line=None):
+        start = 0 if start_line is None else bisect_left(self.__lines, start_line)
+        end = len(self.__lines) if end_line is None \
+            else bisect_right(self.__lines, end_line)
+        return self.__lines[start:end]
@@ -0,0 +1,63 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from output import BASICOutput
+from program import Program
+import interpreter
+
+source = '''10 FOR I = 1 TO 500
+20 PRINT "LINE"; I
+30 NEXT I
+'''
+
+
+class StreamWriterTest(unittest.TestCase):
+
+    def test_execute_async_to_stream_writer(self):
+        program = interpreter.load(Program(), source)
+        expected = ''.join('LINE' + str(i) + '\n' for i in range(1, 501))
+
+        async def serve(reader, writer):
+            await program.execute_async(output=BASICOutput(writer),
+                                        slice_lines=10)
+            await writer.drain()
+            writer.close()
+
+        async def main():
+            server = await asyncio.start_server(serve, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                received = await reader.read()
+                writer.close()
+                return received
+
+        self.assertEqual(asyncio.run(main()).decode('utf-8'), expected)
+
+    def test_sessions_share_one_loop(self):
+        program = interpreter.load(Program(), source)
+
+        class Buffer:
+            def __init__(self):
+                self.data = b''
+
+            def write(self, data):
+                self.data += data
+
+        async def main():
+            buffers = [Buffer() for _ in range(4)]
+            await asyncio.gather(*[program.execute_async(output=BASICOutput(buffer),
+                                                         slice_lines=7)
+                                   for buffer in buffers])
+            return buffers
+
+        outputs = {buffer.data for buffer in asyncio.run(main())}
+        self.assertEqual(len(outputs), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
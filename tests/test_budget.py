@@ -0,0 +1,76 @@
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budget import Budget, BudgetExceeded
+from output import BASICOutput
+from program import Program
+import interpreter
+
+forever = '''10 I = 0
+20 I = I + 1
+30 GOTO 20
+'''
+
+
+def run(source, budget, engine='tree'):
+    # The BudgetExceeded the run stopped with, or None if it finished
+    program = interpreter.load(Program(), source)
+    try:
+        program.execute(engine=engine, output=BASICOutput(io.BytesIO()),
+                        budget=budget)
+
+    except BudgetExceeded as err:
+        return err
+
+    return None
+
+
+class BudgetTest(unittest.TestCase):
+
+    def check(self, source, budget, limit, line_number):
+        for engine in ['tree', 'vm']:
+            with self.subTest(engine=engine):
+                err = run(source, budget, engine)
+                self.assertIsNotNone(err)
+                self.assertEqual(err.budget, limit)
+                self.assertEqual(err.line_number, line_number)
+
+    def test_lines(self):
+        self.check(forever, Budget(lines=100), 'lines', 30)
+        # The line limit is exact whatever the check interval
+        self.assertIsNone(run('10 FOR I = 1 TO 33\n20 NEXT I\n',
+                              Budget(lines=67, check_every=7)))
+
+    def test_seconds(self):
+        ticks = iter(range(1000000))
+        budget = Budget(seconds=50, check_every=10, timer=lambda: next(ticks))
+        self.check(forever, budget, 'seconds', 20)
+
+    def test_gosub_depth(self):
+        source = '10 GOSUB 10\n20 RETURN\n'
+        self.check(source, Budget(gosub_depth=50, check_every=1), 'gosub_depth', 10)
+
+    def test_memory_growing_string(self):
+        # The string doubles every line, far faster than the check interval
+        source = '10 A$ = "X"\n20 A$ = A$ + A$\n30 GOTO 20\n'
+        self.check(source, Budget(memory=10 ** 6), 'memory', 30)
+
+    def test_memory_dim(self):
+        # Refused before the array is made
+        for source in ['10 DIM A(300000000)\n', '10 DIM A$(300000000)\n']:
+            self.check(source, Budget(memory=10 ** 6), 'memory', 10)
+        self.assertIsNone(run('10 DIM A(1000)\n', Budget(memory=10 ** 6)))
+
+    def test_within_budget(self):
+        budget = Budget(lines=1000, seconds=60, gosub_depth=10, memory=10 ** 6)
+        for engine in ['tree', 'vm']:
+            self.assertIsNone(run('10 FOR I = 1 TO 100\n20 GOSUB 40\n30 NEXT I\n'
+                                  '35 STOP\n40 RETURN\n', budget, engine))
+
+
+if __name__ == '__main__':
+    unittest.main()
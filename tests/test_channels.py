@@ -0,0 +1,93 @@
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from channels import BASICChannels
+from output import BASICOutput
+from program import Program
+import interpreter
+
+
+def run(source, engine='tree', channels=None):
+    # The program's console output, or the error it stopped with
+    stream = io.BytesIO()
+    program = interpreter.load(Program(), source)
+    try:
+        program.execute(engine=engine, output=BASICOutput(stream),
+                        channels=channels)
+
+    except RuntimeError as err:
+        return str(err)
+
+    return stream.getvalue().decode('utf-8')
+
+
+class ChannelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'data.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_write_then_read(self):
+        source = '''10 OPEN "%s" FOR OUTPUT AS #1
+20 FOR I = 1 TO 3
+30 PRINT #1, I; ","; "ITEM"; I
+40 NEXT I
+50 CLOSE #1
+60 OPEN "%s" FOR INPUT AS #2
+70 IF EOF(2) THEN 110
+80 INPUT #2, N, A$
+90 PRINT N; A$
+100 GOTO 70
+110 PRINT "DONE"
+''' % (self.path, self.path)
+        expected = '1ITEM1\n2ITEM2\n3ITEM3\nDONE\n'
+        for engine in ['tree', 'vm']:
+            with self.subTest(engine=engine):
+                self.assertEqual(run(source, engine), expected)
+                # Every input file is mapped
+                self.assertEqual(run(source, engine,
+                                     BASICChannels(map_threshold=1)), expected)
+
+    def test_input_past_end(self):
+        with open(self.path, 'w') as data:
+            data.write('1\n')
+        source = '10 OPEN "%s" FOR INPUT AS #1\n20 INPUT #1, A, B\n' % self.path
+        self.assertEqual(run(source),
+                         'Input past end of file #1 in line 20')
+
+    def test_input_type_mismatch(self):
+        with open(self.path, 'w') as data:
+            data.write('A1,B1\n')
+        source = '10 OPEN "%s" FOR INPUT AS #1\n20 INPUT #1, X$, Y\n' % self.path
+        for engine in ['tree', 'vm']:
+            with self.subTest(engine=engine):
+                self.assertEqual(run(source, engine),
+                                 "Type mismatch reading 'B1' into Y from file #1"
+                                 " in line 20")
+
+    def test_open_number_as_file_name(self):
+        # The number must not be taken as a descriptor of this process
+        read_end, write_end = os.pipe()
+        try:
+            source = '10 OPEN %d FOR OUTPUT AS #1\n' % write_end
+            for engine in ['tree', 'vm']:
+                with self.subTest(engine=engine):
+                    self.assertIn('Type mismatch in OPEN', run(source, engine))
+                    os.fstat(write_end)
+
+        finally:
+            os.close(read_end)
+            os.close(write_end)
+
+
+if __name__ == '__main__':
+    unittest.main()
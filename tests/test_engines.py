@@ -0,0 +1,169 @@
+import glob
+import io
+import os
+import sys
+import unittest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+from output import BASICOutput
+from program import Program
+import imagecache
+import interpreter
+
+# Edge cases the benchmark programs do not reach, by name
+programs = {
+    'for_skip': '''10 FOR I = 1 TO 2
+20 FOR J = 5 TO 1
+30 PRINT "NO"
+40 NEXT J
+50 PRINT I; J
+60 NEXT I
+70 FOR K = 1 TO 0 : PRINT "NEVER"
+80 NEXT K : PRINT "AFTER"; K
+90 FOR A = 1 TO 2
+100 FOR B = 1 TO 0
+110 PRINT "NO"
+120 NEXT B, A
+130 PRINT A; B
+140 FOR X = 3 TO 1 STEP -0.5
+150 PRINT X;
+160 NEXT X
+170 PRINT
+''',
+    'same_line_for': '''10 FOR I = 1 TO 3 : PRINT I; : NEXT I : PRINT "DONE"
+20 FOR I = 1 TO 2 : FOR J = 1 TO 2 : PRINT I * 10 + J; : NEXT J : NEXT I
+30 FOR K = 1 TO 0 : PRINT "NEVER" : NEXT K : PRINT "SKIPPED"; K
+40 FOR A = 1 TO 2 : PRINT "A"; A;
+50 NEXT A : PRINT
+60 IF 1 THEN FOR S = 1 TO 2
+70 PRINT "S"; S;
+80 NEXT S
+''',
+    'gosub': '''10 FOR Q = 1 TO 3
+20 GOSUB 100
+30 NEXT Q
+40 ON 2 GOSUB 200, 300
+50 GOSUB 400
+60 STOP
+100 FOR R = 1 TO Q
+110 PRINT Q * 10 + R;
+120 NEXT R
+130 PRINT
+140 RETURN
+200 PRINT "ONE"
+210 RETURN
+300 PRINT "TWO"
+310 RETURN
+400 IF Q < 6 THEN Q = Q + 1 : GOSUB 400
+410 PRINT Q;
+420 RETURN
+''',
+    'if_else': '''10 X = 5
+20 IF X > 3 THEN PRINT "BIG" : PRINT "YES" ELSE PRINT "SMALL"
+30 IF X < 3 THEN PRINT "SMALL" ELSE PRINT "NOT SMALL"
+40 IF NOT X = 2 AND X < 10 THEN 60
+50 PRINT "SKIPPED"
+60 IF X = 5 THEN 80 ELSE 70
+70 PRINT "SKIPPED"
+80 IF X THEN PRINT "TRUE"
+90 IF X - 5 THEN PRINT "SKIPPED"
+100 PRINT "END"
+''',
+    'data': '''10 DATA 1, -2.5, "X"
+20 READ A, B
+30 READ C$
+40 PRINT A; B; C$
+50 RESTORE 70
+60 DATA 7, 8
+70 DATA 9
+80 READ D
+90 PRINT D
+100 RESTORE
+110 READ E, F
+120 PRINT E + F
+130 RESTORE 60
+140 READ G, H, I
+150 PRINT G; H; I
+160 READ J
+''',
+    'undefined_line': '''10 PRINT "A"
+20 GOTO 50
+''',
+    'division_by_zero': '''10 X = 10 * 60 + 5 : PRINT X
+20 Y = X / 0
+''',
+    'next_without_for': '''10 NEXT I
+''',
+    'negative_dimension': '''10 DIM A(-1)
+''',
+    'string_subscript': '''10 DIM A(3)
+20 A("1") = 1
+''',
+    'return_without_gosub': '''10 PRINT "A"
+20 RETURN
+''',
+}
+
+for path in sorted(glob.glob(os.path.join(root, 'benchmarks', 'programs', '*.bas'))):
+    with open(path) as source:
+        programs[os.path.basename(path)] = source.read()
+
+
+def run(source, engine, optimize):
+    # The program's output and, if it stopped with an error, the error
+    stream = io.BytesIO()
+    try:
+        program = interpreter.load(Program(optimize=optimize), source)
+        program.execute(engine=engine, output=BASICOutput(stream))
+
+    except (SyntaxError, RuntimeError, ValueError, TypeError, IndexError,
+            KeyError, ZeroDivisionError, OverflowError) as err:
+        return stream.getvalue(), type(err).__name__ + ': ' + str(err)
+
+    return stream.getvalue(), None
+
+
+class EngineTest(unittest.TestCase):
+
+    # Every program must give the same output and error on both engines,
+    # with and without the optimizer
+
+    def test_engines_agree(self):
+        for name, source in programs.items():
+            with self.subTest(program=name):
+                expected = run(source, 'tree', False)
+                for engine, optimize in [('tree', True), ('vm', False),
+                                         ('vm', True)]:
+                    self.assertEqual(run(source, engine, optimize), expected,
+                                     engine + (' optimized' if optimize else ''))
+
+    def test_edge_cases_run(self):
+        # Guards against all four runs agreeing on nothing at all
+        self.assertEqual(run(programs['for_skip'], 'tree', False)[1], None)
+        self.assertIn('division', run(programs['division_by_zero'], 'vm', True)[1].lower())
+        self.assertEqual(run(programs['same_line_for'], 'vm', True)[0],
+                         b'123DONE\n11122122SKIPPED1\nA1A2\nS1S2')
+        self.assertEqual(run('10 IF 1 THEN FOR S = 1 TO 2 : PRINT S\n', 'tree', False)[1],
+                         'SyntaxError: Syntax error: FOR must be the last statement'
+                         ' of an IF branch in line 10')
+        self.assertEqual(run(programs['negative_dimension'], 'tree', False)[1],
+                         'IndexError: Negative dimension for array A in line 10')
+        self.assertEqual(run(programs['string_subscript'], 'tree', False)[1],
+                         'TypeError: Type mismatch in subscript of array A in line 20')
+
+    def test_long_strings_are_not_folded(self):
+        # The line never runs, so the strings must never be built
+        program = interpreter.load(Program(optimize=True), '''10 IF 0 THEN PRINT TAB(200000000)
+20 IF 0 THEN A$ = "ABCDEFGHIJ" * 20000000
+30 A$ = "AB" * 200 : PRINT LEN(A$)
+''')
+        self.assertLess(len(imagecache.dumps(program.image())), 10000)
+        stream = io.BytesIO()
+        program.execute(output=BASICOutput(stream))
+        self.assertEqual(stream.getvalue(), b'400\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import io
+import marshal
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from output import BASICOutput
+from program import Program
+import imagecache
+import interpreter
+
+source = b'''10 DIM A(3), B$(2)
+20 FOR I = 0 TO 3
+30 A(I) = I * I
+40 NEXT I
+50 B$(1) = "HI"
+60 IF A(3) > 5 THEN PRINT B$(1); A(3) ELSE PRINT "NO"
+70 GOSUB 100
+80 STOP
+100 PRINT LEFT$("ABCDEF", 2); TAB(8); "END"
+110 RETURN
+'''
+
+
+def run(program, engine='tree'):
+    stream = io.BytesIO()
+    program.execute(engine=engine, output=BASICOutput(stream))
+    return stream.getvalue()
+
+
+class Trap:
+
+    # Unpickling one creates the file at path
+    def __init__(self, path):
+        self.path = path
+
+    def __reduce__(self):
+        return open, (self.path, 'w')
+
+
+class ImageCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'prog.basc')
+        self.digest = imagecache.source_hash(source)
+        self.program = interpreter.load(Program(), source)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, data):
+        with open(self.path, 'wb') as cache_file:
+            cache_file.write(data)
+
+    def test_round_trip(self):
+        imagecache.save(self.path, self.digest, self.program)
+        cached = imagecache.load(self.path, self.digest)
+        for engine in ['tree', 'vm']:
+            with self.subTest(engine=engine):
+                self.assertEqual(run(cached, engine), run(self.program, engine))
+
+    def test_header_mismatch(self):
+        imagecache.save(self.path, self.digest, self.program)
+        self.assertIsNone(imagecache.load(self.path, imagecache.source_hash(b'')))
+
+        with open(self.path, 'rb') as cache_file:
+            data = cache_file.read()
+        version = len(imagecache.MAGIC)
+        for offset in [0, version, version + 1]:
+            with self.subTest(offset=offset):
+                # The magic number, the version and the interpreter tag
+                self.write(data[:offset] + bytes([data[offset] ^ 1]) +
+                           data[offset + 1:])
+                self.assertIsNone(imagecache.load(self.path, self.digest))
+
+    def stored(self):
+        return marshal.loads(imagecache.dumps(self.program.image()))
+
+    def test_unknown_node(self):
+        stored = self.stored()
+        stored['compiled'][10] = [(b'Trap',) + stored['compiled'][10][0][1:]]
+        with self.assertRaisesRegex(ValueError, 'Unknown node'):
+            imagecache.loads(marshal.dumps(stored))
+
+    def test_wrong_field_count(self):
+        stored = self.stored()
+        stored['compiled'][50] = [stored['compiled'][50][0] + (None,)]
+        with self.assertRaisesRegex(ValueError, 'Unknown node'):
+            imagecache.loads(marshal.dumps(stored))
+
+        self.write(imagecache.header(self.digest) + marshal.dumps(stored))
+        self.assertIsNone(imagecache.load(self.path, self.digest))
+
+    def test_pickle_is_not_loaded(self):
+        trap_path = os.path.join(self.directory, 'trapped')
+        self.write(imagecache.header(self.digest) + pickle.dumps(Trap(trap_path)))
+        self.assertIsNone(imagecache.load(self.path, self.digest))
+        self.assertFalse(os.path.exists(trap_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
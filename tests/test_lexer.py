@@ -0,0 +1,31 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import Lexer
+
+
+def tokens(source):
+    return [(line_number, [(token.category, token.lexeme) for token in tokenlist])
+            for line_number, tokenlist in Lexer().tokenize_source(source)]
+
+
+class BytesSourceTest(unittest.TestCase):
+
+    def test_non_ascii_names(self):
+        source = '10 ÉTÉ = 1\n20 PRINT ÉTÉ; "été"\n'
+        self.assertEqual(tokens(source.encode('utf-8')), tokens(source))
+
+    def test_non_ascii_symbol_after_name(self):
+        with self.assertRaisesRegex(SyntaxError, 'source line 1, column 4'):
+            tokens('10 A→ = 1\n'.encode('utf-8'))
+
+    def test_invalid_utf8(self):
+        with self.assertRaisesRegex(SyntaxError, 'source line 2, column 3'):
+            tokens(b'10 X = 1\n20 \xff = 1\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
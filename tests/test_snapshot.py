@@ -0,0 +1,124 @@
+import io
+import marshal
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import zlib
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+from output import BASICOutput
+from program import Program
+import interpreter
+import snapshot
+
+# Restores a snapshot from stdin and runs it to the end in a new process
+restore = '''import sys
+sys.path.insert(0, %r)
+from output import BASICOutput
+from program import Program
+program = Program.restore_snapshot(sys.stdin.buffer.read())
+program.execute(output=BASICOutput(sys.stdout.buffer))
+''' % root
+
+
+def source(directory):
+    return '''10 DIM Q(5), N$(5)
+20 OPEN "%s" FOR INPUT AS #1
+30 FOR I = 1 TO 5
+40 READ V
+50 Q(I) = V * I + 0.5
+60 N$(I) = "N" + STR$(I)
+70 GOSUB 200
+80 NEXT I
+90 IF EOF(1) THEN 130
+100 INPUT #1, A$, K
+110 PRINT A$; K
+120 GOTO 90
+130 PRINT Q(2); N$(3)
+140 STOP
+200 PRINT "SUB"; I; TAB(10); V
+210 RETURN
+300 DATA 5, 6, 7, 8, 9
+''' % os.path.join(directory, 'in.txt')
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(os.path.join(self.directory, 'in.txt'), 'w') as data:
+            data.write('X,1\nY,2\nZ,3\n')
+        self.program = interpreter.load(Program(), source(self.directory))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def snapshots(self, every):
+        # The whole output of a run, and each snapshot it took with the
+        # output written before it
+        stream = io.BytesIO()
+        taken = []
+        self.program.execute(output=BASICOutput(stream), checkpoint_every=every,
+                             checkpoint=lambda data: taken.append(
+                                 (data, len(stream.getvalue()))))
+        return stream.getvalue(), taken
+
+    def test_restore_in_new_process(self):
+        output, taken = self.snapshots(3)
+        self.assertTrue(taken)
+        for data, written in taken:
+            restored = subprocess.run([sys.executable, '-c', restore], input=data,
+                                      stdout=subprocess.PIPE, check=True)
+            self.assertEqual(output[:written] + restored.stdout, output)
+
+    def test_restore_in_process(self):
+        output, taken = self.snapshots(7)
+        data, written = taken[-1]
+        stream = io.BytesIO()
+        Program.restore_snapshot(data).execute(output=BASICOutput(stream))
+        self.assertEqual(output[:written] + stream.getvalue(), output)
+
+    def test_other_version(self):
+        data = self.snapshots(7)[1][0][0]
+        version = len(snapshot.MAGIC)
+        data = data[:version] + bytes([data[version] + 1]) + data[version + 1:]
+        with self.assertRaisesRegex(ValueError, 'Not a snapshot'):
+            Program.restore_snapshot(data)
+
+    def test_pickle_is_not_loaded(self):
+        trap_path = os.path.join(self.directory, 'trapped')
+
+        class Trap:
+            def __reduce__(self):
+                return open, (trap_path, 'w')
+
+        data = snapshot.header() + zlib.compress(pickle.dumps({'image': Trap()}))
+        with self.assertRaisesRegex(ValueError, 'Corrupt snapshot'):
+            Program.restore_snapshot(data)
+        self.assertFalse(os.path.exists(trap_path))
+
+    def test_code_is_refused(self):
+        data = snapshot.header() + zlib.compress(marshal.dumps(
+            {'image': b'', 'index': compile('0', 'snapshot', 'eval')}))
+        with self.assertRaisesRegex(ValueError, 'Cannot restore code'):
+            Program.restore_snapshot(data)
+
+    def test_corrupt_array(self):
+        data = self.snapshots(7)[1][-1][0]
+        header = snapshot.header()
+        state = marshal.loads(zlib.decompress(data[len(header):]))
+        name, bounds, (typecode, buffer) = state['evaluator']['arrays'][0]
+        state['evaluator']['arrays'][0] = (name, bounds, (typecode, buffer[:-8]))
+        program = Program.restore_snapshot(header + zlib.compress(marshal.dumps(state)))
+        with self.assertRaisesRegex(ValueError, 'does not match its dimensions'):
+            program.execute(output=BASICOutput(io.BytesIO()))
+
+
+if __name__ == '__main__':
+    unittest.main()
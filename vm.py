@@ -0,0 +1,541 @@
+from basictoken import BASICToken as Token
+from basicnode import Const, Var, ArrayRef, Unary, Binary, Call, Assign, \
+    ArrayAssign, Print, If, For, Next, Goto, Gosub, Return, Data
+from evaluator import BASICEvaluator
+from flowsignal import FlowSignal
+from bisect import bisect_right
+
+class Op:
+    CONST       = 0   # push arg
+    LOAD        = 1   # push variable in slot arg
+    STORE       = 2   # pop into variable in slot arg
+    ADD         = 3
+    SUB         = 4
+    MUL         = 5
+    LESSER      = 6
+    GREATER     = 7
+    EQUAL       = 8
+    NOTEQUAL    = 9
+    BINARY      = 10  # arg is the operator token category
+    NEG         = 11
+    NOT         = 12
+    CALL        = 13  # arg is (function token category, argument count)
+    JUMP        = 14  # arg is a code offset
+    JUMP_FALSE  = 15  # pop, jump to arg if false
+    JUMP_LINE   = 16  # jump to line arg, or to a popped line if arg is None
+    GOSUB       = 17  # arg is (target offset, return offset)
+    GOSUB_LINE  = 18  # arg is (target line or None to pop, return offset)
+    RETURN      = 19
+    FOR_INIT    = 20  # pop start, step, end; arg is (slot, skip, body, line)
+    NEXT        = 22  # arg is (loop variable slot, name, line)
+    PRINT_ITEM  = 23  # pop value; arg is is tab
+    PRINT_END   = 24  # arg is newline
+    EXEC        = 25  # arg is ([statement], line, return offset)
+    HALT        = 26
+    ARRAY_LOAD  = 27  # pop subscripts; arg is (array slot, subscript count, line)
+    ARRAY_STORE = 28  # pop value, then subscripts; same arg as ARRAY_LOAD
+    EOF         = 29  # replace file number with EOF(n); arg is line
+    LINE        = 30  # start of line arg, only in code compiled with trace
+
+    binary_opcodes = {Token.PLUS: ADD, Token.MINUS: SUB, Token.TIMES: MUL,
+                      Token.LESSER: LESSER, Token.GREATER: GREATER,
+                      Token.EQUAL: EQUAL, Token.NOTEQUAL: NOTEQUAL}
+
+
+class Bytecode:
+
+    def __init__(self, code, line_numbers, line_starts):
+        self.code = code
+        self.line_numbers = line_numbers
+        self.line_starts = line_starts
+        self.line_index = dict(zip(line_numbers, line_starts))
+
+    def line_at(self, pc):
+        position = bisect_right(self.line_starts, pc) - 1
+        if position < 0:
+            return None
+        return self.line_numbers[position]
+
+
+class Label:
+
+    # A jump target left open in a line's code until it is linked:
+    #   local   the instruction at offset value in the same line
+    #   line    the first instruction of line number value, if it exists
+    #   return  the first instruction of the following line, or None if
+    #           this is the last line
+    #   skip    the instruction after the NEXT for loop variable value
+    #           that the next line starting with such a NEXT has, or the
+    #           final HALT
+
+    __slots__ = ('kind', 'value')
+
+    def __init__(self, kind, value=None):
+        self.kind = kind
+        self.value = value
+
+
+class LineCode:
+
+    # One line compiled on its own: its instructions, the offsets of
+    # those with labels to resolve, the loop variables of the NEXT
+    # statements the line starts with, and the offset after the first
+    # NEXT for each loop variable
+
+    __slots__ = ('code', 'fixups', 'leading_next', 'after_next')
+
+    def __init__(self, code, fixups, leading_next, after_next):
+        self.code = code
+        self.fixups = fixups
+        self.leading_next = leading_next
+        self.after_next = after_next
+
+
+class BytecodeCompiler:
+
+    # Each line is compiled to a LineCode that depends on no other line,
+    # so a program's lines can be compiled once and only the lines edited
+    # since compiled again; link() then lays the lines out in order and
+    # resolves their labels.
+
+    def compile(self, lines, trace=False):
+        return self.link([(line_number, self.compile_line(line_number, stmts))
+                          for line_number, stmts in lines], trace)
+
+    def compile_line(self, line_number, stmts):
+        self.__code = []
+        self.__line_number = line_number
+        self.__after_next = {}
+
+        # A loop body starts right after its FOR_INIT, and a loop whose NEXT
+        # follows its FOR on the line skips to just after that NEXT
+        open_loops = {}
+        for stmt in stmts:
+            self.__stmt(stmt)
+            if type(stmt) == For:
+                open_loops[stmt.var] = len(self.__code) - 1
+            elif type(stmt) == Next and stmt.var in open_loops:
+                self.__code[open_loops.pop(stmt.var)][1][1] = \
+                    Label('local', len(self.__code))
+
+        leading_next = []
+        for stmt in stmts:
+            if type(stmt) != Next:
+                break
+            if stmt.var not in leading_next:
+                leading_next.append(stmt.var)
+
+        code = []
+        fixups = []
+        for op, arg in self.__code:
+            if self.__labelled(arg):
+                fixups.append(len(code))
+            elif type(arg) == list:
+                arg = tuple(arg)
+            code.append((op, arg))
+
+        return LineCode(code, fixups, leading_next, self.__after_next)
+
+    def __labelled(self, arg):
+        if type(arg) == Label:
+            return True
+        return type(arg) == list and any(type(item) == Label for item in arg)
+
+    def link(self, lines, trace=False):
+        code = []
+        line_starts = []
+        next_positions = {}
+        for position, (line_number, line_code) in enumerate(lines):
+            line_starts.append(len(code))
+            if trace:
+                code.append((Op.LINE, line_number))
+            code.extend(line_code.code)
+            for loop_variable in line_code.leading_next:
+                next_positions.setdefault(loop_variable, []).append(position)
+
+        halt = len(code)
+        code.append((Op.HALT, None))
+
+        line_numbers = [line_number for line_number, line_code in lines]
+        line_index = dict(zip(line_numbers, line_starts))
+        bases = [start + 1 for start in line_starts] if trace else line_starts
+
+        def resolve(label):
+            if type(label) != Label:
+                return label
+            elif label.kind == 'local':
+                return base + label.value
+            elif label.kind == 'line':
+                return line_index.get(label.value)
+            elif label.kind == 'return':
+                return line_starts[position + 1] if position + 1 < len(lines) else None
+
+            next_lines = next_positions.get(label.value, [])
+            index = bisect_right(next_lines, position)
+            if index < len(next_lines):
+                next_position = next_lines[index]
+                return bases[next_position] + \
+                    lines[next_position][1].after_next[label.value]
+            return halt
+
+        for position, (line_number, line_code) in enumerate(lines):
+            base = bases[position]
+            for offset in line_code.fixups:
+                op, arg = code[base + offset]
+                # Jumps to lines that do not exist are kept by line number
+                # so they fail at run time, and only if they are taken
+                if op == Op.JUMP and arg.kind == 'line' and arg.value not in line_index:
+                    op, arg = Op.JUMP_LINE, arg.value
+                elif op == Op.GOSUB and arg[0].value not in line_index:
+                    op, arg = Op.GOSUB_LINE, [arg[0].value, arg[1]]
+
+                if type(arg) == list:
+                    arg = tuple(resolve(item) for item in arg)
+                else:
+                    arg = resolve(arg)
+                code[base + offset] = (op, arg)
+
+        return Bytecode(code, line_numbers, line_starts)
+
+    def __emit(self, op, arg=None):
+        self.__code.append([op, arg])
+        return len(self.__code) - 1
+
+    def __return_label(self):
+        return Label('return')
+
+    def __stmtlist(self, stmts):
+        for stmt in stmts:
+            self.__stmt(stmt)
+
+    def __stmt(self, stmt):
+        stmt_type = type(stmt)
+
+        if stmt_type == Assign:
+            self.__expr(stmt.expr)
+            self.__emit(Op.STORE, stmt.slot)
+
+        elif stmt_type == ArrayAssign:
+            for index in stmt.indices:
+                self.__expr(index)
+            self.__expr(stmt.expr)
+            self.__emit(Op.ARRAY_STORE, (stmt.slot, len(stmt.indices),
+                                         self.__line_number))
+
+        elif stmt_type == Print and stmt.filenum is None:
+            # PRINT # runs through EXEC, like the other file statements
+            for expr, prntTab in stmt.items:
+                self.__expr(expr)
+                self.__emit(Op.PRINT_ITEM, prntTab)
+            self.__emit(Op.PRINT_END, stmt.newline)
+
+        elif stmt_type == If:
+            self.__expr(stmt.cond)
+            jump_false = self.__emit(Op.JUMP_FALSE)
+
+            self.__branch(stmt.then_target, stmt.then_body)
+            jump_end = self.__emit(Op.JUMP)
+
+            self.__code[jump_false][1] = Label('local', len(self.__code))
+            self.__branch(stmt.else_target, stmt.else_body)
+            self.__code[jump_end][1] = Label('local', len(self.__code))
+
+        elif stmt_type == Goto:
+            self.__jump(stmt.target)
+
+        elif stmt_type == Gosub:
+            if type(stmt.target) == Const:
+                self.__emit(Op.GOSUB, [Label('line', stmt.target.value),
+                                       self.__return_label()])
+            else:
+                self.__expr(stmt.target)
+                self.__emit(Op.GOSUB_LINE, [None, self.__return_label()])
+
+        elif stmt_type == Return:
+            self.__emit(Op.RETURN)
+
+        elif stmt_type == For:
+            self.__forstmt(stmt)
+
+        elif stmt_type == Next:
+            self.__emit(Op.NEXT, (stmt.slot, stmt.var, self.__line_number))
+            self.__after_next.setdefault(stmt.var, len(self.__code))
+
+        elif stmt_type == Data:
+            pass
+
+        else:
+            self.__emit(Op.EXEC, [[stmt], self.__line_number,
+                                  self.__return_label()])
+
+    def __branch(self, target, body):
+        if target is not None:
+            self.__jump(target)
+        elif body is not None:
+            self.__stmtlist(body)
+
+    def __jump(self, target):
+        if type(target) == Const:
+            self.__emit(Op.JUMP, Label('line', target.value))
+        else:
+            self.__expr(target)
+            self.__emit(Op.JUMP_LINE)
+
+    def __forstmt(self, stmt):
+        self.__expr(stmt.end)
+        if stmt.step is None:
+            self.__emit(Op.CONST, 1)
+        else:
+            self.__expr(stmt.step)
+        self.__expr(stmt.start)
+        self.__emit(Op.FOR_INIT, [stmt.slot, Label('skip', stmt.var),
+                                  Label('local', len(self.__code) + 1),
+                                  self.__line_number])
+
+    def __expr(self, expr):
+        expr_type = type(expr)
+
+        if expr_type == Const:
+            self.__emit(Op.CONST, expr.value)
+
+        elif expr_type == Var:
+            self.__emit(Op.LOAD, expr.slot)
+
+        elif expr_type == ArrayRef:
+            for index in expr.indices:
+                self.__expr(index)
+            self.__emit(Op.ARRAY_LOAD, (expr.slot, len(expr.indices),
+                                        self.__line_number))
+
+        elif expr_type == Binary:
+            self.__expr(expr.left)
+            self.__expr(expr.right)
+            if expr.op in Op.binary_opcodes:
+                self.__emit(Op.binary_opcodes[expr.op])
+            else:
+                self.__emit(Op.BINARY, expr.op)
+
+        elif expr_type == Unary:
+            self.__expr(expr.operand)
+            self.__emit(Op.NEG if expr.op == Token.MINUS else Op.NOT)
+
+        elif expr_type == Call and expr.func == Token.EOF:
+            self.__expr(expr.args[0])
+            self.__emit(Op.EOF, self.__line_number)
+
+        elif expr_type == Call:
+            for arg in expr.args:
+                self.__expr(arg)
+            self.__emit(Op.CALL, (expr.func, len(expr.args)))
+
+
+class BASICVM:
+
+    def __init__(self, bytecode, evaluator, on_line=None, return_stack=None):
+        self.__bytecode = bytecode
+        self.__evaluator = evaluator
+        self.__on_line = on_line
+        self.__return_stack = return_stack if return_stack is not None else []
+
+    def __jump_line(self, line_number):
+        if line_number not in self.__bytecode.line_index:
+            raise RuntimeError('Line number ' + str(line_number) +
+                               ' does not exist')
+        return self.__bytecode.line_index[line_number]
+
+    def run(self):
+        CONST, LOAD, STORE = Op.CONST, Op.LOAD, Op.STORE
+        ADD, SUB, MUL, BINARY = Op.ADD, Op.SUB, Op.MUL, Op.BINARY
+        LESSER, GREATER, EQUAL, NOTEQUAL = Op.LESSER, Op.GREATER, Op.EQUAL, Op.NOTEQUAL
+        NEG, NOT, CALL = Op.NEG, Op.NOT, Op.CALL
+        JUMP, JUMP_FALSE, JUMP_LINE = Op.JUMP, Op.JUMP_FALSE, Op.JUMP_LINE
+        GOSUB, GOSUB_LINE, RETURN = Op.GOSUB, Op.GOSUB_LINE, Op.RETURN
+        FOR_INIT, NEXT = Op.FOR_INIT, Op.NEXT
+        PRINT_ITEM, PRINT_END, EXEC, HALT = Op.PRINT_ITEM, Op.PRINT_END, Op.EXEC, Op.HALT
+        ARRAY_LOAD, ARRAY_STORE, EOF = Op.ARRAY_LOAD, Op.ARRAY_STORE, Op.EOF
+        LINE = Op.LINE
+
+        code = self.__bytecode.code
+        evaluator = self.__evaluator
+        symbols = evaluator.symbol_table
+        arrays = evaluator.arrays
+        binary_ops = BASICEvaluator.binary_ops
+        functions = evaluator.functions
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        return_stack = self.__return_stack
+        loops = {}
+        pc = 0
+
+        while True:
+            op, arg = code[pc]
+            pc += 1
+
+            if op == LOAD:
+                value = symbols[arg]
+                if value is None:
+                    raise evaluator.undefined(arg, self.__bytecode.line_at(pc - 1))
+                push(value)
+
+            elif op == CONST:
+                push(arg)
+
+            elif op == STORE:
+                symbols[arg] = pop()
+
+            elif op == ADD:
+                right = pop()
+                stack[-1] = stack[-1] + right
+
+            elif op == SUB:
+                right = pop()
+                stack[-1] = stack[-1] - right
+
+            elif op == MUL:
+                right = pop()
+                stack[-1] = stack[-1] * right
+
+            elif op == LESSER:
+                right = pop()
+                stack[-1] = stack[-1] < right
+
+            elif op == GREATER:
+                right = pop()
+                stack[-1] = stack[-1] > right
+
+            elif op == EQUAL:
+                right = pop()
+                stack[-1] = stack[-1] == right
+
+            elif op == NOTEQUAL:
+                right = pop()
+                stack[-1] = stack[-1] != right
+
+            elif op == JUMP_FALSE:
+                if not pop():
+                    pc = arg
+
+            elif op == JUMP:
+                pc = arg
+
+            elif op == FOR_INIT:
+                loop_variable, skip, body, line_number = arg
+                start_val = pop()
+                step = pop()
+                end_val = pop()
+
+                if step == 0:
+                    raise IndexError('Zero step value supplied for loop' +
+                                     ' in line ' + str(line_number))
+
+                symbols[loop_variable] = start_val
+                if (step > 0 and start_val > end_val) or (step < 0 and start_val < end_val):
+                    loops.pop(loop_variable, None)
+                    pc = skip
+                else:
+                    loops[loop_variable] = (end_val, step, body)
+                    pc = body
+
+            elif op == NEXT:
+                loop_variable = arg[0]
+                if loop_variable not in loops:
+                    raise RuntimeError('NEXT without FOR for loop variable ' +
+                                       arg[1] + ' in line ' + str(arg[2]))
+                end_val, step, body = loops[loop_variable]
+                value = symbols[loop_variable] + step
+                symbols[loop_variable] = value
+
+                if (step > 0 and value > end_val) or (step < 0 and value < end_val):
+                    del loops[loop_variable]
+                else:
+                    pc = body
+
+            elif op == ARRAY_LOAD or op == ARRAY_STORE:
+                slot, count, line_number = arg
+                array = arrays[slot]
+                if array is None:
+                    array = evaluator.array(slot, line_number)
+                if op == ARRAY_STORE:
+                    value = pop()
+                indices = stack[-count:]
+                del stack[-count:]
+
+                try:
+                    if op == ARRAY_LOAD:
+                        push(array.get(indices))
+                    else:
+                        array.set(indices, value)
+
+                except (IndexError, TypeError) as err:
+                    raise type(err)(str(err) + ' in line ' + str(line_number))
+
+            elif op == BINARY:
+                right = pop()
+                stack[-1] = binary_ops[arg](stack[-1], right)
+
+            elif op == CALL:
+                function, count = arg
+                if count == 1:
+                    stack[-1] = functions[function](stack[-1])
+                else:
+                    args = stack[-count:]
+                    del stack[-count:]
+                    push(functions[function](*args))
+
+            elif op == NEG:
+                stack[-1] = -stack[-1]
+
+            elif op == NOT:
+                stack[-1] = not stack[-1]
+
+            elif op == PRINT_ITEM:
+                evaluator.print_value(pop(), arg)
+
+            elif op == PRINT_END:
+                if arg:
+                    evaluator.print_newline()
+
+            elif op == EOF:
+                stack[-1] = evaluator.eof(stack[-1], arg)
+
+            elif op == GOSUB or op == GOSUB_LINE:
+                target, return_pc = arg
+                if return_pc is None:
+                    raise RuntimeError("GOSUB at end of program, nowhere to return")
+                if op == GOSUB_LINE:
+                    target = self.__jump_line(pop() if target is None else target)
+                return_stack.append(return_pc)
+                pc = target
+
+            elif op == RETURN:
+                pc = return_stack.pop()
+
+            elif op == JUMP_LINE:
+                pc = self.__jump_line(pop() if arg is None else arg)
+
+            elif op == EXEC:
+                stmts, line_number, return_pc = arg
+                flowsignal = evaluator.execute(stmts, line_number)
+
+                if flowsignal:
+                    if flowsignal.ftype == FlowSignal.SIMPLE_JUMP:
+                        pc = self.__jump_line(flowsignal.ftarget)
+
+                    elif flowsignal.ftype == FlowSignal.GOSUB:
+                        if return_pc is None:
+                            raise RuntimeError("GOSUB at end of program, nowhere to return")
+                        return_stack.append(return_pc)
+                        pc = self.__jump_line(flowsignal.ftarget)
+
+                    elif flowsignal.ftype == FlowSignal.RETURN:
+                        pc = return_stack.pop()
+
+                    elif flowsignal.ftype == FlowSignal.STOP:
+                        break
+
+            elif op == LINE:
+                self.__on_line(arg)
+
+            elif op == HALT:
+                break